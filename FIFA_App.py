@@ -1,16 +1,36 @@
 
-import string
+import base64
+import json
 import urllib.parse
 import pandas as pd
 import numpy as np
 import streamlit as st 
-import seaborn as sns
-import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import plotly.express as px
 from PIL import Image
 
+import fifa_build
+import fifa_compare
+import fifa_cube
+import fifa_data
+import fifa_figures
+import fifa_index
+import fifa_search
+import fifa_sections
+import fifa_squad
+import fifa_stream
+import fifa_table
+
+fifa_sections.start_run()
+# debug switch: the instrumentation is process-wide and only changes when someone presses it,
+# so the reruns of other sessions leave it as it is
+if fifa_sections.PROFILE:
+    if st.sidebar.button('Debug: stop profiling (all sessions)'):
+        fifa_sections.enable(False)
+elif st.sidebar.button('Debug: start profiling (all sessions)'):
+    fifa_sections.enable(True)
+
 st.write('*By:\nTejas Linge & Saurav Himmatrao Chavan*')
 
 logoIm = Image.open('logo.png')
@@ -31,74 +51,72 @@ st.markdown('''## This application is a Streamlit dashboard which can be used to
 st.image(image, caption = 'FIFA-20 Cover', use_column_width = True)
 
 ###########################################################################################################
-@st.cache(persist = True)
-def load_data():
+@st.cache(allow_output_mutation = True)
+def load_data(version):
 
-    fifa = pd.read_csv(r'players_20.csv')
-    fifa.set_index('short_name', inplace = True)
-    
-    defense_pos = np.array(['CB','LB','RB'])
-    defenders = fifa[fifa['player_positions'].isin(i for i in defense_pos)]
-    defense_attributes = defenders[['overall', 'potential', 'defending', 'physic', 'pace', 'passing', 'dribbling', 'attacking_heading_accuracy', 'attacking_short_passing', 'skill_long_passing', 'skill_ball_control', 'movement_sprint_speed', 'movement_acceleration', 'movement_reactions', 'power_shot_power', 'power_jumping', 'power_stamina', 'power_strength', 'power_long_shots', 'defending_marking', 'defending_standing_tackle', 'defending_sliding_tackle',]]
-    defense_attributes= defense_attributes.dropna()
-    defense_attributes = defense_attributes.corr()
-
-    gk_attributes = fifa[['overall', 'potential', 'gk_diving', 'gk_handling', 'gk_speed', 'gk_reflexes', 'gk_kicking', 'gk_positioning', 'goalkeeping_diving', 'goalkeeping_handling', 'goalkeeping_kicking', 'goalkeeping_positioning', 'goalkeeping_reflexes']]
-    gk_attributes = gk_attributes.dropna()    
-    gk_attributes = gk_attributes.corr()
-    
-    attack_pos = np.array(['LS','RS','ST','CF','CAM','RM','LM','RW','LW','LAM','RAM'])
-    attackers = fifa[fifa['player_positions'].isin(i for i in attack_pos)]
-    attack = attackers[['overall', 'potential', 'skill_moves', 'pace','shooting', 'passing', 'dribbling', 'physic',
-                   'attacking_crossing', 'attacking_finishing', 'attacking_heading_accuracy', 'attacking_short_passing',
-                   'attacking_volleys', 'skill_dribbling', 'skill_curve', 'skill_fk_accuracy', 'skill_long_passing',
-                   'skill_ball_control', 'movement_acceleration', 'movement_sprint_speed', 'movement_agility',
-                   'movement_reactions', 'movement_balance', 'power_shot_power', 'power_jumping', 'power_stamina',
-                   'power_strength', 'power_long_shots']]
-    attack = attack.dropna()
-    attack_corr = attack.corr()
-    
-    fifa = fifa[['long_name', 'age', 'club', 'nationality', 'overall', 'potential', 'value_eur',
-                'wage_eur', 'player_positions', 'preferred_foot', 'international_reputation', 'weak_foot', 'skill_moves', 'work_rate', 'body_type',
-                'release_clause_eur', 'team_position', 'team_jersey_number', 'nation_position', 'nation_jersey_number', 'pace', 'shooting', 'passing', 'dribbling', 'defending',
-                'physic', 'attacking_crossing', 'attacking_finishing', 'attacking_heading_accuracy', 'attacking_short_passing',
-                'attacking_volleys', 'skill_dribbling', 'skill_curve', 'skill_fk_accuracy', 'skill_long_passing', 'skill_ball_control',
-                'movement_acceleration', 'movement_sprint_speed', 'movement_agility', 'movement_reactions', 'movement_balance', 'power_shot_power', 'power_jumping',
-                'power_stamina', 'power_strength', 'power_long_shots', 'mentality_aggression', 'mentality_interceptions', 'mentality_positioning', 'mentality_vision', 'mentality_penalties',
-                'mentality_composure', 'defending_marking', 'defending_standing_tackle', 'defending_sliding_tackle', 'goalkeeping_handling']]
-
-    fifa.columns = ['Full_Name', 'Age', 'Club', 'Nationality', 'Overall', 'Potential', 'Value(Euro)', 'Wage(Euro)', 'Position(s)', 'Foot', 'International Reputation', 'Weak Foot', 'Skill Moves', 'Work Rate', 'Body Type', 'Release Clause', 'Team Pos', 'Jersey No.', 'National Pos', 'National Jersey No.',
-                    'Pace', 'Shooting', 'Passing', 'Dribbling', 'Defending', 'Physic'] + [str(i) for i in fifa.columns[26:]] 
-
-    fifa.fillna('-', inplace = True)
-    fifa['Club'].fillna('No Club', inplace = True)
-    fifa['Position(s)'].fillna('unknown', inplace = True)
-    fifa['Work Rate'].fillna('Medium/ Medium', inplace = True)
-    fifa['Foot'].fillna('Right', inplace = True)
-    fifa['International Reputation'].fillna('No Rep', inplace = True)
-
-    return fifa, gk_attributes, defense_attributes, attack_corr
-
-data = load_data()
+    aggregates = fifa_build.load_bundle()
+
+    return fifa_data.dashboard_view(fifa_data.shared_arrow()), aggregates['gk_corr'], aggregates['defense_corr'], aggregates['attack_corr'], aggregates
+
+VERSION = fifa_data.table_version()
+FINGERPRINT = fifa_data.data_fingerprint()
+with fifa_sections.span('load_data', 'st.cache'):
+    data = load_data(VERSION)
 data_all = data[0]
 GK_ATT = data[1]
 DEF_ATT = data[2]
 ATT_ATT = data[3]
+AGGREGATES = data[4]
+
+@fifa_sections.memoized
+def position_index(version):
+    return fifa_index.PositionIndex(data_all['Position(s)'])
+
+@fifa_sections.memoized
+def ranking_index(version):
+    return fifa_index.RankingIndex(data_all, orders = AGGREGATES['rankings'])
+
+@fifa_sections.memoized
+def aggregation_cube(version):
+    return fifa_cube.AggregationCube(AGGREGATES['cube'])
+
+POSITIONS = position_index(VERSION)
+RANKS = ranking_index(VERSION)
+CUBE = aggregation_cube(VERSION)
+
+def position_group(positions, mode = 'any'):
+    # registers the row mask of a position query with the ranking index, keyed by the query
+    return RANKS.add_group((mode, tuple(sorted(positions))), lambda: POSITIONS.query(list(positions), mode))
+
+###########################################################################################################
+# Tables are served a page at a time (see fifa_table.py)
+@fifa_sections.memoized
+def paged_table(version, name, columns = None):
+    return fifa_table.PagedTable(data_all, RANKS, columns = columns)
+
+def show_table(name, table, sort = None, ascending = False, group = None):
+    # one fixed-size page per interaction, sorted and filtered on the server
+    options = [None] + table.sortable
+    sort = st.selectbox('Sort by:', options, options.index(sort), format_func = lambda c: '(table order)' if c is None else c, key = name + ' sort')
+    ascending = st.checkbox('Ascending', ascending, key = name + ' ascending')
+    pages = table.page_count(sort, ascending, group)
+    number = int(st.number_input('Page (of {}):'.format(pages), 1, pages, 1, key = name + ' page'))
+    total = len(table.rows(sort, ascending, group))
+    st.write('Rows {} to {} of {}'.format(min(total, (number - 1) * table.page_rows + 1), min(total, number * table.page_rows), total))
+    page = table.page(number - 1, sort, ascending, group)
+    fifa_sections.register_counter('pages ' + name, lambda: (table.hits, table.misses))
+    if fifa_sections.PROFILE:
+        fifa_sections.gauge('table ' + name, page.memory_usage(deep = True).sum())
+    st.dataframe(page)
 
 ###########################################################################################################
-st.markdown('## Scatter Plot of All Players in FIFA-20')
 def all_players():
-    fig = go.Figure(data=go.Scatter(
-        x = data_all['Overall'],
-        y = data_all['Value(Euro)'],
-        mode='markers',
-        marker=dict(
-            size=16,
-            color=data_all['Age'], #set color equal to a variable
-            colorscale='Plasma', # one of plotly colorscales
-            showscale=True
-        ),
-        text= data_all.index,
+    # SVG for small frames, WebGL above fifa_figures.WEBGL_THRESHOLD, a binned density grid above BINNING_THRESHOLD
+    fig = go.Figure(data=fifa_figures.scalable_scatter(
+        data_all['Overall'],
+        data_all['Value(Euro)'],
+        data_all['Age'],
+        data_all.index,
     ))
 
     fig.update_layout(title='Styled Scatter Plot (colored by Age) year 2020 - Overall Rating vs Value in Euros',
@@ -109,87 +127,10 @@ def all_players():
                     font=dict(family='Cambria, monospace', size=12, color='#000000'))
     return fig
 
-players = all_players()
-st.plotly_chart(players, use_container_width=True)
-
-st.write('This is a scatter plot of all the players in FIFA-20.')
-
-if st.checkbox("Show Players' Data", False):
-    st.latex("Players' Data")
-    number0 = st.slider('How many Players do you want to display?', 1, 18278)
-    st.write(data_all.iloc[0 : number0, :])
-
 ###########################################################################################################
-#A list of all colors in Plotly Charts (to be used later)
-plotly_colors = np.array(['aliceblue', 'antiquewhite', 'aqua', 'aquamarine', 'azure',
-                'beige', 'bisque', 'black', 'blanchedalmond', 'blue',
-                'blueviolet', 'brown', 'burlywood', 'cadetblue',
-                'chartreuse', 'chocolate', 'coral', 'cornflowerblue',
-                'cornsilk', 'crimson', 'cyan', 'darkblue', 'darkcyan',
-                'darkgoldenrod', 'darkgray', 'darkgrey', 'darkgreen',
-                'darkkhaki', 'darkmagenta', 'darkolivegreen', 'darkorange',
-                'darkorchid', 'darkred', 'darksalmon', 'darkseagreen',
-                'darkslateblue', 'darkslategray', 'darkslategrey',
-                'darkturquoise', 'darkviolet', 'deeppink', 'deepskyblue',
-                'dimgray', 'dimgrey', 'dodgerblue', 'firebrick',
-                'forestgreen', 'fuchsia', 'gainsboro',
-                'gold', 'goldenrod', 'gray', 'grey', 'green',
-                'greenyellow', 'honeydew', 'hotpink', 'indianred', 'indigo',
-                'ivory', 'khaki', 'lavender', 'lavenderblush', 'lawngreen',
-                'lemonchiffon', 'lightblue', 'lightcoral', 'lightcyan',
-                'lightgoldenrodyellow', 'lightgray', 'lightgrey',
-                'lightgreen', 'lightpink', 'lightsalmon', 'lightseagreen',
-                'lightskyblue', 'lightslategray', 'lightslategrey',
-                'lightsteelblue', 'lightyellow', 'lime', 'limegreen',
-                'linen', 'magenta', 'maroon', 'mediumaquamarine',
-                'mediumblue', 'mediumorchid', 'mediumpurple',
-                'mediumseagreen', 'mediumslateblue', 'mediumspringgreen',
-                'mediumturquoise', 'mediumvioletred', 'midnightblue',
-                'mintcream', 'mistyrose', 'moccasin', 'navy',
-                'oldlace', 'olive', 'olivedrab', 'orange', 'orangered',
-                'orchid', 'palegoldenrod', 'palegreen', 'paleturquoise',
-                'palevioletred', 'papayawhip', 'peachpuff', 'peru', 'pink',
-                'plum', 'powderblue', 'purple', 'red', 'rosybrown',
-                'royalblue', 'saddlebrown', 'salmon', 'sandybrown',
-                'seagreen', 'seashell', 'sienna', 'skyblue',
-                'slateblue', 'slategray', 'springgreen',
-                'steelblue', 'tan', 'teal', 'thistle', 'tomato', 'turquoise',
-                'violet', 'wheat', 'yellow',
-                'yellowgreen'])
-plot_colors_select = plotly_colors.shape[0]
-
-###########################################################################################################
-st.write(''' ## Player Comparison''')
-st.write(''' To compare Players check the box below and select name of Clubs, data to be compared and name of the Players from the side bar ''')
-
-@st.cache(persist = True)
-@st.cache(suppress_st_warning=True)
-@st.cache(allow_output_mutation=True)
-def comparison_data():
-    fifa_org = pd.read_csv('players_20.csv')
-
-    to_drop = ['sofifa_id','player_url', 'long_name', 'body_type', 'real_face', 'player_tags', 'team_jersey_number', 'loaned_from', 'joined', 'contract_valid_until','nation_jersey_number']
-    fifa_org.drop(columns = to_drop, inplace=True)
-
-    def rena(a):                       # function to rename columns
-        if a=='club':
-            return 'Clubs'
-        if a=='short_name':
-            return 'Name'
-        if len(a)==2 or len(a)==3 and a!='age':
-            a = a.upper()
-        else:
-            a = a.replace('_',' ')
-            a = string.capwords(a)
-        return a
-        
-    fifa_org.rename(columns = lambda x: rena(x), inplace=True)
-    fifa_org.rename(columns = {'Height Cm':'Height(cm)','Weight Kg':'Weight(kg)','Value Eur':'Value(Euro)', 'Wage Eur':'Wage(Euro)'}, inplace = True)
-    
-    fifa_org.index+=1
-    return fifa_org
-
-fifa_org = comparison_data()
+@st.cache(allow_output_mutation = True)
+def comparison_data(version):
+    return fifa_data.comparison_view(fifa_data.shared_arrow())
 
 attr = ["Age","Height(cm)","Weight(kg)","Overall","Potential","Value(Euro)","Wage(Euro)","International Reputation","Weak Foot",
   "Skill Moves","Release Clause Eur","Pace","Shooting","Passing","Dribbling","Defending","Physic","Gk Diving","Gk Handling","Gk Kicking",
@@ -201,82 +142,63 @@ attr = ["Age","Height(cm)","Weight(kg)","Overall","Potential","Value(Euro)","Wag
   "Goalkeeping Reflexes","LS","ST","RS","LW","LF","CF","RF","RW","LAM","CAM","RAM","LM","LCM","CM","RCM","RM","LWB","LDM","CDM","RDM",
   "RWB","LB","LCB","CB","RCB","RB"]
 
-if st.checkbox("Check the box to compare Players"):
-    
-    teams = np.array(st.sidebar.multiselect("Select the name of Club:", fifa_org['Clubs'].unique()))
-    
-    variables = np.array(st.sidebar.multiselect("Select data to compare:", attr))
-    
-    selected_clubs = fifa_org[fifa_org['Clubs'].isin(teams)][variables]#.set_index('Name', inplace = True)
-    selected_clubs['Name'] = fifa_org['Name']
-    selected_clubs.set_index('Name', inplace = True)    
-    selected_players = st.sidebar.multiselect('Select the Players to be compared:', selected_clubs.index)#.Name.unique())#.loc[:, 'Name'])#..unique())#, two_clubs_data.Name.unique())
-    
-    is_check = st.checkbox("Check the box to display Players of selected Clubs")
-    
-    if is_check:
-        a = [teams, variables, selected_clubs]
-        
-        if not a:
-            st.write('''### Please select required fields!''')
-        else:
-            st.write(selected_clubs)
-
-        if st.button("Click to see comparison Graphically"):
-            if not a:
-                st.write('''### Please select required fields!''')
-            else:                
-                graphToPlot = pd.DataFrame(selected_clubs.loc[selected_players, :])
-                values = graphToPlot.values[:, :]
-                #st.write(values)
-                @st.cache(persist = True)
-                def Comp(ALL, COLS, n):
-                    SamePlot = make_subplots(subplot_titles = variables[n:])
-                    SamePlot.add_trace(go.Bar(x = ALL.index, y = ALL.values[:, n]))                                    
-                    return SamePlot
-                for n in range(0, variables.shape[0]):
-                    FIGURE = Comp(graphToPlot, values, n)
-                    FIGURE.update_traces(marker_color=plotly_colors[np.random.randint(0, plot_colors_select)])
-                    st.plotly_chart(FIGURE)
-
-##################################################
+@fifa_sections.memoized
+def comparison_engine(version):
+    return fifa_compare.ComparisonEngine(comparison_data(version), attr)
+
+# name search: resolves to sofifa_id (short names repeat); rows follow the shared table, like comparison_data
+@fifa_sections.memoized
+def player_search(version):
+    return fifa_search.player_index(fifa_data.shared_table())
+
+PLAYER_SEARCH = player_search(VERSION)
+
+@fifa_sections.traced
+def player_options(rows, search = ''):
+    # sofifa_ids of the search matches first, then of the given rows
+    found = PLAYER_SEARCH.search(search, 20) if search else []
+    return list(dict.fromkeys(PLAYER_SEARCH.ids[np.concatenate([found, rows]).astype(np.intp)].tolist()))
+
+@fifa_sections.memoized
+def similarity_index(version):
+    return fifa_compare.SimilarityIndex(comparison_engine(version))
+
+###########################################################################################################
+# Best XI: cached per formation and budget (the budget is free-form, so only the last results are kept)
+@fifa_sections.memoized
+def squad_optimizer(version):
+    # comparison frame and data_all share their row order, so the position bitmasks apply directly
+    return fifa_squad.SquadOptimizer(comparison_engine(version), comparison_data(version)['Clubs'], POSITIONS)
+
+@fifa_sections.memoized(size = 32)
+def best_xi(version, club, formation, budget_column, budget):
+    SQUADS = squad_optimizer(version)
+    if club is None:
+        return SQUADS.best_xi(formation, budget_column = budget_column, budget = budget)
+    return SQUADS.club_xi(club, formation, budget_column, budget)
+
+@fifa_sections.memoized(size = 8)
+def clubs_by_xi(version, formation, budget_column, budget):
+    return fifa_table.PagedTable(squad_optimizer(version).all_clubs(formation, budget_column, budget))
+
+
+###########################################################################################################
+# matplotlib/seaborn are only imported when a figure is not in the render cache
 def gk_attributes():
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     plt.figure(figsize = (28,12))
     sns.set_context('poster',font_scale=1)
     sns.heatmap(GK_ATT , annot = True).set_title('Correlation between GK Attributes')
 
-st.markdown('## Correlation between Different GK 🧤 Attributes')
-GK_ATTR = gk_attributes()
-st.pyplot()
-
-if st.checkbox('Show GK Attributes Correlation Table', False):
-    st.latex('GK  Attributes  Correlation  Table')
-    st.write(GK_ATT)    
-
-st.write('''Here we can see how different goal-keeping attributes may be related to each other and how they may contribute to the overall attributes of a GK.
-            For example, correlation between GK Handling and Overall attributes is 0.93 and that of Speed and Overall attributes is 0.48.
-            Thus, we can infer from this data that speed is not that of an important factor when it comes to judging the quality of a GK but handling is.
-            \nNOTE : Correlation doesn't always imply causation i.e it is not always necessary that two attributes who have a correlation close to 1 are always related to each other nor that they are not related to each other if correlation is close to 0. There may be other factors 
-                   involved for two properties to affect each other.''')
-
 ###########################################################################################################
 def defense_attributes():
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     plt.figure(figsize = (28,12))
     sns.set_context('poster',font_scale=1)
     sns.heatmap(DEF_ATT , annot = True).set_title('Correlation between Def Attributes')
 
-st.markdown('## Correlation between Different Defense 🛡️ Attributes')
-DEF_ATTR = defense_attributes()
-st.pyplot()
-
-if st.checkbox('Show Defender Attributes Correlation Table', False):
-    st.latex('Defense Attributes Correlation Table')
-    st.write(DEF_ATT)
-
-st.write('''Here we can see how different defense attributes may be related to each other and how they may contribute to the overall attributes of a Defender.
-            \nNOTE : It is not always necessary that 2 attributes who have a correlation close to 1 are always related to each other. There may be other factors 
-                   involved for two properties to affect each other.''')
-
 ###########################################################################################################
 def attack_attributes():
     fig = go.Figure(data=go.Heatmap(
@@ -286,30 +208,26 @@ def attack_attributes():
                    hoverongaps = True))
     return fig
     
-st.markdown('## Correlation between Different Attacking ⚽ Attributes')
-ATT_ATT_Heatmap = attack_attributes()
-st.plotly_chart(ATT_ATT_Heatmap, use_container_width=True)
-
-if st.checkbox('Show Attack Attributes Correlation Table', False):
-    st.latex('Attacking Attributes Correlation Table')
-    st.write(ATT_ATT)
-st.write('''Here we can see how different attacking attributes may be related to each other and how they may contribute to the overall attributes of a Attackers.''')
-    
-###########################################################################################################    
-st.markdown('## Total Count of Left v/s Right Footed Players')
-sns.set(style = 'darkgrid')
-plt.figure(figsize = (35,15))
-sns.set_context('poster',font_scale=1.5)
-sns.countplot(x = 'Foot', data = data_all, palette = 'coolwarm').set_title('Left v/s Right')
-st.pyplot()
-st.write('From the above countplot, we can see the total number of Left and Right footed players.')
 ###########################################################################################################
-st.markdown('## Top Clubs by Total Player Value (Euro 💶)')           
+def foot_count():
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    sns.set(style = 'darkgrid')
+    plt.figure(figsize = (35,15))
+    sns.set_context('poster',font_scale=1.5)
+    sns.countplot(x = 'Foot', data = data_all, palette = 'coolwarm').set_title('Left v/s Right')
+
+###########################################################################################################
+@fifa_sections.traced
+def clubs_by_value():
+    return CUBE.measure(['Club'], 'Value(Euro)', 'sum').rename('Value(Euro)').to_frame()
+
+@fifa_sections.memoized
+def clubs_table(version):
+    return fifa_table.PagedTable(clubs_by_value())
+
 def top20_clubs():
-    TopClubsInVal = data_all[['Club', 'Value(Euro)']]
-    #TopClubsInVal = TopClubsInVal.set_index(n for n in range(TopClubsInVal.shape[0]))
-    TopClubsInVal = pd.DataFrame(TopClubsInVal.groupby('Club')['Value(Euro)'].sum()).sort_values('Value(Euro)', ascending = False)
-    Top20ClubsInVal = pd.DataFrame(TopClubsInVal.groupby('Club')['Value(Euro)'].sum()).sort_values('Value(Euro)', ascending = False).head(20)
+    Top20ClubsInVal = clubs_by_value().head(20)
 
     fig = go.Figure(
             data = [go.Bar(y = Top20ClubsInVal['Value(Euro)'],
@@ -318,23 +236,11 @@ def top20_clubs():
             
     )
     fig.update_traces(marker_color='green')
-    return fig, TopClubsInVal
-
-ClubsTop20_FIG = top20_clubs()[0]
-ClubsTABLE = top20_clubs()[1]
- 
-st.plotly_chart(ClubsTop20_FIG, use_container_width=True)
-
-if st.checkbox('Top Clubs by Value (Euro 💶) Table', False):
-    st.latex('Table - Clubs by Value (Euro)')
-    number1 = st.slider('How many Clubs do you want to display?', 1, 698)
-    st.write(ClubsTABLE.iloc[0 : number1, :])
+    return fig
 
 ###########################################################################################################
 def MVPs():
-    most_valued = data_all[['Value(Euro)', 'Club', 'Nationality']]
-    most_valued = most_valued.sort_values('Value(Euro)', ascending = False)
-    most_valued30 = most_valued.sort_values('Value(Euro)', ascending = False).head(30)
+    most_valued30 = RANKS.top('Value(Euro)', 30, columns = ['Value(Euro)', 'Club', 'Nationality'])
     fig = go.Figure(
             data = [go.Bar(y = most_valued30['Value(Euro)'],
                         x = most_valued30.index)],
@@ -342,24 +248,11 @@ def MVPs():
             
             layout_title_text = '30 Highest Valued Players of Fifa 20'
     )
-    return fig, most_valued
-
-most_valued_playersFIG = MVPs()[0]
-most_valued_playersALL = MVPs()[1]
-st.markdown('## Highest Valued Players of FIFA-20 (Euro 💶)')
-st.plotly_chart(most_valued_playersFIG)
-
-if st.checkbox('Players by Value (Euro 💶)', False):
-    st.latex('Table - Players by Value')
-    number2 = st.slider('How many Players (by Value) do you want to display?', 1, most_valued_playersALL.shape[0])
-    st.write(most_valued_playersALL.iloc[0 : number2, :])
-
+    return fig
 
 ###########################################################################################################
 def top_ratings():
-    top_ratings = data_all[['Club', 'Overall', 'Potential', 'Value(Euro)']]
-    top_ratings = top_ratings.sort_values('Overall', ascending = False)
-    top30_ratings = top_ratings.head(30)
+    top30_ratings = RANKS.top('Overall', 30, columns = ['Club', 'Overall', 'Potential', 'Value(Euro)'])
 
     fig = go.Figure(
             data = [go.Bar(y = top30_ratings['Overall'],
@@ -367,22 +260,12 @@ def top_ratings():
             layout_title_text = 'Top 30 Rated Players of Fifa 20'
     )
     fig.update_traces(marker_color='#00A')
-    return fig, top_ratings
-top_ratedFIG = top_ratings()[0]
-top_ratedALL = top_ratings()[1]
-
-
-st.markdown('## Highest Rated Players of FIFA-20')
-st.plotly_chart(top_ratedFIG)
-if st.checkbox('Players by Ratings', False):
-    st.latex('Table - Players by Ratings')
-    number3 = st.slider('How many Players (by Ratings) do you want to display?', 1, top_ratedALL.shape[0])
-    st.write(top_ratedALL.iloc[0 : number3, :])
-
+    return fig
 ###########################################################################################################
-st.markdown('## Top 30 Free-Kick Takers')
 def fk():
-    best_fk = data_all[['skill_fk_accuracy']].sort_values('skill_fk_accuracy', ascending = False).head(30)
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    best_fk = RANKS.top('skill_fk_accuracy', 30, columns = ['skill_fk_accuracy'])
 
     x = best_fk.skill_fk_accuracy
     plt.figure(figsize=(12,8))
@@ -395,14 +278,9 @@ def fk():
     ax.set_title(label = "Bar Plot of Best Free-Kick Takers", fontsize = 20)
     return ax
 
-free_kick = fk()
-st.pyplot()
-
 ###########################################################################################################
 def bestgk():
-    GK = data_all[data_all['Position(s)'] == 'GK']
-    GK = GK[['Club', 'Nationality', 'Overall', 'Potential']]
-    GK = GK.sort_values('Overall', ascending = False).head(20)
+    GK = RANKS.top('Overall', 20, group = position_group(['GK'], 'primary'), columns = ['Club', 'Nationality', 'Overall', 'Potential'])
 
     fig = go.Figure(
             data = [go.Bar(y = GK['Overall'],
@@ -412,77 +290,65 @@ def bestgk():
     fig.update_traces(marker_color='goldenrod')
     return fig
 
-BESTGK = bestgk()
-st.markdown("## Top 20 GK's 🧤 of FIFA-20")
-st.plotly_chart(BESTGK)
+# Promising players: the scouting thresholds are parameters of one indexed query
+@fifa_sections.memoized
+def promising_index(version):
+    return fifa_index.PromisingIndex(data_all, POSITIONS)
+
+PROMISING = promising_index(VERSION)
+fifa_sections.register_counter('promising queries', lambda: (PROMISING.hits, PROMISING.misses))
 
-top_clubs = ['Real Madrid', 'Manchester City', 'Tottenham Hotspur', 'Napoli',
-             'FC Barcelona', 'Juventus', 'Paris Saint-Germain', 'Liverpool',
-             'Manchester United', 'Chelsea', 'Atlético Madrid', 'Arsenal',
-             'Borussia Dortmund', 'FC Bayern MÃ¼nchen', 'West Ham United', 'FC Schalke 04',
-             'Roma', 'Leicester City', 'Inter', 'Milan']
-condition_top20 = ((data_all['Potential'] - data_all['Overall']) >= 15) & (data_all['Potential'] >= 80) & (data_all['Club'].isin(top_clubs))  & (data_all['Age'] <= 20) 
-young_players_top20 = data_all[condition_top20].sort_values('Potential', ascending = False)
+@fifa_sections.memoized
+def club_search(version):
+    return fifa_search.club_index(PROMISING.clubs)
 
-young_clubs_top20 = young_players_top20.Club
-young_clubs_top20 = pd.DataFrame(young_clubs_top20.value_counts())
+CLUB_SEARCH = club_search(VERSION)
 
-condition_all = ((data_all['Potential'] - data_all['Overall']) >= 15) & (data_all['Potential'] >= 80)   & (data_all['Age'] <= 20) 
-young_players_all = data_all[condition_all].sort_values('Potential', ascending = False)
+@fifa_sections.traced
+def club_options(search = ''):
+    # names of the clubs matching the search first (typo tolerant), then every club
+    found = CLUB_SEARCH.search(search, 20) if search else []
+    return list(dict.fromkeys([CLUB_SEARCH.labels[i] for i in found] + CLUB_SEARCH.labels))
+# matched after normalization, so spelling variants and mojibake still resolve to the club in the data
+TOP_CLUBS = tuple(PROMISING.clubs[i] for i in (CLUB_SEARCH.lookup(c) for c in fifa_build.TOP_CLUBS) if i is not None)
 
-young_clubs_all = young_players_all.Club
-young_clubs_all = pd.DataFrame(young_clubs_all.value_counts())
+def promising_group(min_growth = 15, min_potential = 80, max_age = 20, clubs = None, positions = ()):
+    # the matching players as a row group of the ranking index, so their tables page like the others
+    def build():
+        mask = np.zeros(len(data_all), dtype = bool)
+        mask[PROMISING.query(min_growth, min_potential, max_age, clubs, positions)] = True
+        return mask
+    return RANKS.add_group(('promising', min_growth, min_potential, max_age, clubs, positions), build)
 
 ###########################################################################################################
-def young():
+def young(min_growth = 15, min_potential = 80, max_age = 20, clubs = TOP_CLUBS, positions = ()):
+    young_clubs_top20 = PROMISING.club_counts(PROMISING.query(min_growth, min_potential, max_age, clubs, positions))
+    young_clubs_all = PROMISING.club_counts(PROMISING.query(min_growth, min_potential, max_age, None, positions))
     fig = make_subplots(1, 2, specs=[[{'type':'domain'}, {'type':'domain'}]],
                         subplot_titles=['From Top 20 Clubs', 'From All Clubs'])
-    fig.add_trace(go.Pie(labels=young_clubs_top20.index, values= young_clubs_top20.Club, scalegroup='one',
+    fig.add_trace(go.Pie(labels=young_clubs_top20.index, values= young_clubs_top20.values, scalegroup='one',
                         name="From Top 20 Clubs"), 1, 1)
-    fig.add_trace(go.Pie(labels=young_clubs_all.head(20).index, values=young_clubs_all.head(20).Club, scalegroup='one',
+    fig.add_trace(go.Pie(labels=young_clubs_all.head(20).index, values=young_clubs_all.head(20).values, scalegroup='one',
                         name="From All Clubs"), 1, 2)
 
     #fig.update_layout(title_text='Count of Promising Young Players')
     return fig
-Young = young()
-
-
-st.markdown('### Count of Most Promising Young Players From Top Clubs and All over the World')
-st.plotly_chart(Young)
-st.write('''AS Monaco (France) has the highest number of promising players (9) and FC Barcelona (Spain) has the highest number of promising players (8) among Top-20 Clubs.\
-          There are 59 Players under 20 in the Top 20 Clubs and 321 total player among all clubs who have high room of improvement 
-          and the potential to become some of the Top players in the World.''')
+###########################################################################################################
+@fifa_sections.traced
+def young_cheapest(min_growth = 15, min_potential = 80, max_age = 20, positions = ()):
+    rows = PROMISING.query(min_growth, min_potential, max_age, None, positions)
+    rows = rows[np.argsort(fifa_index.column_values(data_all, 'Value(Euro)')[rows], kind = 'stable')]
+    return RANKS.take(rows, ['Age', 'Club', 'Nationality', 'Overall', 'Potential', 'Value(Euro)', 'Wage(Euro)', 'Position(s)'])
 
-if st.checkbox('Show All Promising Players from Top 20 Clubs', False):
-    st.latex('Promising Players From Top 20 Clubs')
-    number5 = st.slider('How many Players (from TOP 20 Clubs) do you want to display?', 1, young_players_top20.shape[0])
-    st.write(young_players_top20.iloc[0 : number5, :])
+def YPP(min_growth = 15, min_potential = 80, max_age = 20, positions = ()): #YoungPlayerPrice
 
-if st.checkbox('Show All Promising Players', False):
-    st.latex('All Promising Players')
-    number6 = st.slider('How many Players (ALL) do you want to display?', 1, young_players_all.shape[0])
-    st.write(young_players_all.iloc[0 : number6, :])
+    young_players_all_cheapest = young_cheapest(min_growth, min_potential, max_age, positions)
 
-###########################################################################################################
-st.markdown('## Scatter Plot of all Promising Players')
-def YPP(): #YoungPlayerPrice
-
-    young_players_all_cheapest = young_players_all[['Age', 'Club', 'Nationality', 'Overall', 'Potential', 'Value(Euro)', 'Wage(Euro)', 'Position(s)']].sort_values('Value(Euro)', ascending = True) 
-    #young_players_all_cheapest = young_players_all_cheapest[young_players_all_cheapest['Potential'] >= 85]
-
-    fig = go.Figure()
-
-    fig = go.Figure(data=go.Scatter(
-        x = young_players_all_cheapest['Potential'],
-        y = young_players_all_cheapest['Value(Euro)'],
-        mode='markers',
-        marker=dict(
-            size=16,
-            color=young_players_all_cheapest['Age'], #set color equal to a variable
-            colorscale='Plasma', # one of plotly colorscales
-            showscale=True
-        ),
-        text= young_players_all_cheapest.index,
+    fig = go.Figure(data=fifa_figures.scalable_scatter(
+        young_players_all_cheapest['Potential'],
+        young_players_all_cheapest['Value(Euro)'],
+        young_players_all_cheapest['Age'],
+        young_players_all_cheapest.index,
     ))
 
     fig.update_layout(title='Potential of Promising Young Players vs Value in Euros',
@@ -491,16 +357,365 @@ def YPP(): #YoungPlayerPrice
                     paper_bgcolor='rgba(0,0,0,0)',
                     plot_bgcolor='rgba(0,0,0,0)',
                     font=dict(family='Cambria, monospace', size=12, color='#000000'))
-    return fig, young_players_all_cheapest
+    return fig
 
-YPPC = YPP()[0]
-YPPC_Table = YPP()[1]
+###########################################################################################################
+# Pages: only the selected page is computed and rendered on a rerun
+def players_page():
+    st.markdown('## Scatter Plot of All Players in FIFA-20')
+    players = fifa_figures.cached_plotly('all_players', FINGERPRINT, all_players)
+    st.plotly_chart(players, use_container_width=True)
 
-st.plotly_chart(YPPC)
+    st.write('This is a scatter plot of all the players in FIFA-20.')
 
-if st.checkbox('Show All Promising Players by Value (Euro 💶)', False):
-    st.latex('All Promising Players by Value')
-    number7 = st.slider('How many Players (Cheapest first) do you want to display?', 1, YPPC_Table.shape[0])
-    st.write(YPPC_Table.iloc[0 : number7, :])
-    
-###########################################################################################################
+    if st.checkbox("Show Players' Data", False):
+        st.latex("Players' Data")
+        positions = st.multiselect('Only Players at positions (any of):', POSITIONS.listed())
+        show_table('players', paged_table(VERSION, 'players'), group = position_group(positions) if positions else None)
+
+def comparison_page():
+    st.write(''' ## Player Comparison''')
+    st.write(''' To compare Players check the box below and select name of Clubs, data to be compared and name of the Players from the side bar ''')
+
+    with fifa_sections.span('comparison_data', 'st.cache'):
+        fifa_org = comparison_data(VERSION)
+    COMPARE = comparison_engine(VERSION)
+
+    if st.checkbox("Check the box to compare Players"):
+
+        club_search = st.sidebar.text_input('Search Clubs by name:')
+        teams = np.array(st.sidebar.multiselect("Select the name of Club:", club_options(club_search)))
+
+        positions = st.sidebar.multiselect("Filter by position (any of):", POSITIONS.listed())
+
+        variables = np.array(st.sidebar.multiselect("Select data to compare:", attr))
+
+        # fifa_org and data_all share their row order, so the position bitmap applies directly
+        selected_rows = fifa_org['Clubs'].isin(teams).to_numpy() & POSITIONS.query(positions)
+        # gathered column by column, so the shared comparison frame is not consolidated
+        selected_clubs = fifa_data.take_rows(fifa_org, selected_rows, variables)
+        selected_clubs.index = pd.Index(fifa_org['Name'].to_numpy()[selected_rows], name = 'Name')
+        search = st.sidebar.text_input('Search Players by name (any Club):')
+        selected_players = st.sidebar.multiselect('Select the Players to be compared:', player_options(np.flatnonzero(selected_rows), search), format_func = PLAYER_SEARCH.label)
+
+        is_check = st.checkbox("Check the box to display Players of selected Clubs")
+
+        if is_check:
+            a = [teams, variables, selected_clubs]
+
+            if not a:
+                st.write('''### Please select required fields!''')
+            else:
+                st.write(fifa_table.display_frame(selected_clubs))
+
+            chart = st.radio('Chart:', ['Grouped bars', 'Radar'])
+            normalize = chart == 'Radar' or st.checkbox('Scale each attribute to % of the best player', False)
+
+            if st.button("Click to see comparison Graphically"):
+                # one gather of the selected rows and one figure, however many players and attributes
+                rows = PLAYER_SEARCH.rows(selected_players)
+                attributes = COMPARE.comparable(variables)
+                if not len(rows) or not attributes:
+                    st.write('''### Please select required fields!''')
+                else:
+                    FIGURE = COMPARE.figure(rows, attributes, kind = 'radar' if chart == 'Radar' else 'bars', normalize = normalize)
+                    st.plotly_chart(FIGURE, use_container_width=True)
+
+def similar_page():
+    st.write(''' ## Similar Players''')
+    st.write(''' Players whose attributes are closest to the selected Player, optionally filtered by position, value and age ''')
+
+    with fifa_sections.span('comparison_data', 'st.cache'):
+        fifa_org = comparison_data(VERSION)
+    SIMILAR = similarity_index(VERSION)
+
+    club_search = st.sidebar.text_input('Search a Club by name:')
+    club = st.sidebar.selectbox("Select the name of Club:", club_options(club_search))
+    in_club = (fifa_org['Clubs'] == club).to_numpy()
+    search = st.sidebar.text_input('Or search a Player by name:')
+    player = st.sidebar.selectbox("Select the Player:", player_options(np.flatnonzero(in_club), search), format_func = PLAYER_SEARCH.label)
+
+    positions = st.sidebar.multiselect("Similar players at position (any of):", POSITIONS.listed())
+    value = fifa_index.column_values(fifa_org, 'Value(Euro)')
+    age = fifa_index.column_values(fifa_org, 'Age')
+    max_value = st.sidebar.slider('Maximum Value(Euro):', 0, int(np.nanmax(value)), int(np.nanmax(value)), step = 500000)
+    max_age = st.sidebar.slider('Maximum Age:', int(np.nanmin(age)), int(np.nanmax(age)), int(np.nanmax(age)))
+    number = st.slider('Number of similar players:', 5, 50, 10)
+
+    candidates = POSITIONS.query(positions) & (value <= max_value) & (age <= max_age)
+    columns = ['Name', 'Clubs', 'Age', 'Overall', 'Value(Euro)']
+
+    rows = PLAYER_SEARCH.rows([player])
+    if len(rows):
+        found, distance = SIMILAR.query(rows[0], number, candidates)
+        table = fifa_data.take_rows(fifa_org, found, columns)
+        table['Distance'] = distance
+        st.write(fifa_table.display_frame(table))
+
+    if st.checkbox('Show the most similar players for every Player of the Club'):
+        # one batched query for the whole squad
+        squad = np.flatnonzero(in_club)
+        found, distance = SIMILAR.batch(squad, 3, candidates)
+        names = fifa_org['Name'].to_numpy(dtype = object)
+        table = pd.DataFrame(names[found], index = pd.Index(names[squad], name = 'Name'), columns = ['1st', '2nd', '3rd'][:found.shape[1]])
+        st.write(fifa_table.display_frame(table))
+
+def squad_page():
+    st.write(''' ## Best Starting XI''')
+    st.write(''' The strongest XI for a formation, picked from the per-position ratings (LS ... RB), optionally within a Value or Wage budget ''')
+    st.write(''' With a budget the XI is approximate: it always fits the budget, but a slightly stronger XI that also fits may exist ''')
+
+    SQUADS = squad_optimizer(VERSION)
+    formation = st.sidebar.selectbox('Formation:', list(fifa_squad.FORMATIONS))
+    budget_column = st.sidebar.selectbox('Budget on:', [None] + fifa_squad.BUDGET_COLUMNS, format_func = lambda c: 'No budget' if c is None else c)
+    budget = None
+    if budget_column == 'Value(Euro)':
+        budget = float(st.sidebar.number_input('Total Value(Euro) of the XI at most:', 0, None, 100000000, 5000000))
+    elif budget_column == 'Wage(Euro)':
+        budget = float(st.sidebar.number_input('Total Wage(Euro) of the XI at most:', 0, None, 500000, 10000))
+    club = st.sidebar.selectbox('Pick from:', [None] + SQUADS.clubs, format_func = lambda c: 'All Players' if c is None else c)
+
+    xi = best_xi(VERSION, club, formation, budget_column, budget)
+    if xi is None:
+        st.write('''### No XI fits this budget''')
+    else:
+        st.write('XI rating {:.1f}, total Value(Euro) {:,.0f}, total Wage(Euro) {:,.0f}'.format(
+            xi['Rating'].fillna(0).mean(), xi['Value(Euro)'].sum(), xi['Wage(Euro)'].sum()))
+        st.write(fifa_table.display_frame(xi.set_index('Position')))
+
+    if st.checkbox('Rank every Club by its best XI', False):
+        show_table('clubs by xi', clubs_by_xi(VERSION, formation, budget_column, budget), sort = 'XI Rating')
+
+def correlations_page():
+    with fifa_sections.section('GK correlations'):
+        st.markdown('## Correlation between Different GK 🧤 Attributes')
+        GK_ATTR = fifa_figures.cached_png('gk_attributes', FINGERPRINT, gk_attributes)
+        st.image(GK_ATTR, use_column_width = True)
+
+        if st.checkbox('Show GK Attributes Correlation Table', False):
+            st.latex('GK  Attributes  Correlation  Table')
+            st.write(GK_ATT)    
+
+        st.write('''Here we can see how different goal-keeping attributes may be related to each other and how they may contribute to the overall attributes of a GK.
+                    For example, correlation between GK Handling and Overall attributes is 0.93 and that of Speed and Overall attributes is 0.48.
+                    Thus, we can infer from this data that speed is not that of an important factor when it comes to judging the quality of a GK but handling is.
+                    \nNOTE : Correlation doesn't always imply causation i.e it is not always necessary that two attributes who have a correlation close to 1 are always related to each other nor that they are not related to each other if correlation is close to 0. There may be other factors 
+                           involved for two properties to affect each other.''')
+
+    with fifa_sections.section('Defense correlations'):
+        st.markdown('## Correlation between Different Defense 🛡️ Attributes')
+        DEF_ATTR = fifa_figures.cached_png('defense_attributes', FINGERPRINT, defense_attributes)
+        st.image(DEF_ATTR, use_column_width = True)
+
+        if st.checkbox('Show Defender Attributes Correlation Table', False):
+            st.latex('Defense Attributes Correlation Table')
+            st.write(DEF_ATT)
+
+        st.write('''Here we can see how different defense attributes may be related to each other and how they may contribute to the overall attributes of a Defender.
+                    \nNOTE : It is not always necessary that 2 attributes who have a correlation close to 1 are always related to each other. There may be other factors 
+                           involved for two properties to affect each other.''')
+
+    with fifa_sections.section('Attack correlations'):
+        st.markdown('## Correlation between Different Attacking ⚽ Attributes')
+        ATT_ATT_Heatmap = fifa_figures.cached_plotly('attack_attributes', FINGERPRINT, attack_attributes)
+        st.plotly_chart(ATT_ATT_Heatmap, use_container_width=True)
+
+        if st.checkbox('Show Attack Attributes Correlation Table', False):
+            st.latex('Attacking Attributes Correlation Table')
+            st.write(ATT_ATT)
+        st.write('''Here we can see how different attacking attributes may be related to each other and how they may contribute to the overall attributes of a Attackers.''')
+
+def seasons_page():
+    st.write(''' ## Seasons Side by Side''')
+    st.write(''' Every players_*.csv file next to the app is streamed in chunks into a per-season summary (run python fifa_stream.py to build them ahead of time) ''')
+
+    files = fifa_stream.season_files()
+    chosen = st.sidebar.multiselect('Seasons:', files, files, format_func = fifa_stream.season_name)
+    if not chosen:
+        st.write('''### Please select required fields!''')
+        return
+
+    with st.spinner('Streaming season files...'):
+        summaries = [(fifa_stream.season_name(p), fifa_stream.load_summary(p)) for p in chosen]
+
+    overview = pd.DataFrame([{
+        'season': name,
+        'Players': int(s['overview']['players'].iloc[0]),
+        'Clubs': len(s['clubs']),
+        'Total Value(Euro)': s['clubs']['value_eur'].sum(),
+        'Total Wage(Euro)': s['clubs']['wage_eur'].sum(),
+        'Mean Overall': (s['clubs']['mean overall'] * s['clubs']['players']).sum() / s['clubs']['players'].sum(),
+    } for name, s in summaries]).set_index('season')
+    st.write(overview)
+
+    matrix = st.selectbox('Correlations of:', ['gk_corr', 'defense_corr', 'attack_corr'], format_func = {'gk_corr': 'Goalkeepers', 'defense_corr': 'Defenders', 'attack_corr': 'Attackers'}.get)
+    fig = make_subplots(1, len(summaries), subplot_titles = [name for name, _ in summaries], shared_yaxes = True)
+    for i, (name, s) in enumerate(summaries):
+        corr = s[matrix]
+        fig.add_trace(go.Heatmap(z = corr.values, x = list(corr.columns), y = list(corr.index), zmin = -1, zmax = 1,
+                                 colorscale = 'RdBu', showscale = i == 0), 1, i + 1)
+    fig.update_layout(height = 700)
+    st.plotly_chart(fig, use_container_width=True)
+
+    column = st.selectbox('Top Players by:', fifa_stream.TOP_COLUMNS)
+    number9 = st.slider('How many Players per season do you want to display?', 1, fifa_stream.TOP_K, 10)
+    st.write(pd.concat([s['top_' + column].head(number9) for _, s in summaries], keys = [name for name, _ in summaries]))
+
+def foot_page():
+    st.markdown('## Total Count of Left v/s Right Footed Players')
+    foot = fifa_figures.cached_png('foot_count', FINGERPRINT, foot_count)
+    st.image(foot, use_column_width = True)
+    st.write('From the above countplot, we can see the total number of Left and Right footed players.')
+
+def clubs_page():
+    with fifa_sections.section('Top clubs by value'):
+        st.markdown('## Top Clubs by Total Player Value (Euro 💶)')
+        ClubsTop20_FIG = fifa_figures.cached_plotly('top20_clubs', FINGERPRINT, top20_clubs)
+
+        st.plotly_chart(ClubsTop20_FIG, use_container_width=True)
+
+        if st.checkbox('Top Clubs by Value (Euro 💶) Table', False):
+            st.latex('Table - Clubs by Value (Euro)')
+            show_table('clubs', clubs_table(VERSION))
+
+    with fifa_sections.section('Highest valued players'):
+        most_valued_playersFIG = fifa_figures.cached_plotly('MVPs', FINGERPRINT, MVPs)
+        st.markdown('## Highest Valued Players of FIFA-20 (Euro 💶)')
+        st.plotly_chart(most_valued_playersFIG)
+
+        if st.checkbox('Players by Value (Euro 💶)', False):
+            st.latex('Table - Players by Value')
+            show_table('by value', paged_table(VERSION, 'by value', ('Value(Euro)', 'Club', 'Nationality')), sort = 'Value(Euro)')
+
+    with fifa_sections.section('Highest rated players'):
+        top_ratedFIG = fifa_figures.cached_plotly('top_ratings', FINGERPRINT, top_ratings)
+
+        st.markdown('## Highest Rated Players of FIFA-20')
+        st.plotly_chart(top_ratedFIG)
+        if st.checkbox('Players by Ratings', False):
+            st.latex('Table - Players by Ratings')
+            show_table('by ratings', paged_table(VERSION, 'by ratings', ('Club', 'Overall', 'Potential', 'Value(Euro)')), sort = 'Overall')
+
+    with fifa_sections.section('Free-kick takers'):
+        st.markdown('## Top 30 Free-Kick Takers')
+        free_kick = fifa_figures.cached_png('fk', FINGERPRINT, fk)
+        st.image(free_kick, use_column_width = True)
+
+    with fifa_sections.section('Top goalkeepers'):
+        BESTGK = fifa_figures.cached_plotly('bestgk', FINGERPRINT, bestgk)
+        st.markdown("## Top 20 GK's 🧤 of FIFA-20")
+        st.plotly_chart(BESTGK)
+
+    with fifa_sections.section('Custom leaderboard'):
+        st.markdown('## Leaderboard by Any Attribute')
+        if st.checkbox('Build a leaderboard', False):
+            growth = 'Growth (Potential - Overall)'
+            numeric = list(data_all.select_dtypes(include = 'number').columns)
+            attribute = st.selectbox('Rank players by:', numeric + [growth])
+            positions = st.multiselect('Positions (leave empty for all players):', POSITIONS.listed())
+            mode = st.radio('Match players whose positions include:', ['any', 'all', 'primary'], format_func = {'any': 'any of them', 'all': 'all of them', 'primary': 'one of them as primary position'}.get)
+            group = position_group(positions, mode) if positions else None
+            number4 = st.slider('How many Players do you want to display?', 1, 100, 20)
+            if attribute == growth:
+                values = data_all['Potential'].to_numpy(dtype = 'float64') - data_all['Overall'].to_numpy(dtype = 'float64')
+                st.write(fifa_table.display_frame(RANKS.top_values(values, number4, group = group, columns = ['Club', 'Position(s)', 'Overall', 'Potential'])))
+            else:
+                st.write(fifa_table.display_frame(RANKS.top(attribute, number4, group = group, columns = ['Club', 'Position(s)', attribute])))
+
+    with fifa_sections.section('Breakdowns'):
+        st.markdown('## Breakdowns by Club, Nationality, Position and Age')
+        if st.checkbox('Build a breakdown', False):
+            # rollups of the precomputed cube, no pass over the players
+            dimensions = st.multiselect('Group by:', fifa_cube.DIMENSIONS, ['Nationality'])
+            metric = st.selectbox('Metric:', fifa_cube.METRICS, fifa_cube.METRICS.index('Wage(Euro)'))
+            stat = st.selectbox('Statistic:', fifa_cube.STATS, fifa_cube.STATS.index('sum'))
+            clubs = st.multiselect('Only these Clubs (leave empty for all):', CUBE.members('Club'))
+            bands = st.multiselect('Only these age bands (leave empty for all):', fifa_cube.AGE_BANDS)
+            cube = CUBE.slice({'Club': clubs, 'Age band': bands}) if clubs or bands else CUBE
+            breakdown = cube.measure(dimensions, metric, stat)
+            number8 = st.slider('How many groups do you want to display?', 1, max(1, len(breakdown)), min(20, max(1, len(breakdown))))
+            if len(dimensions) == 1:
+                st.plotly_chart(go.Figure(data = [go.Bar(x = breakdown.index[:number8], y = breakdown.values[:number8])]), use_container_width=True)
+            st.write(fifa_table.display_frame(breakdown.iloc[0 : number8].to_frame()))
+
+def young_page():
+    st.sidebar.markdown('### Promising player thresholds')
+    min_growth = st.sidebar.slider('Minimum growth (Potential - Overall):', 0, 30, 15)
+    min_potential = st.sidebar.slider('Minimum Potential:', 50, 95, 80)
+    max_age = st.sidebar.slider('Maximum Age of a promising player:', 16, 30, 20)
+    clubs = tuple(st.sidebar.multiselect('Top Clubs:', PROMISING.clubs, list(TOP_CLUBS)))
+    positions = tuple(st.sidebar.multiselect('Positions (any of):', POSITIONS.listed()))
+    params = dict(min_growth = min_growth, min_potential = min_potential, max_age = max_age, positions = positions)
+
+    with fifa_sections.section('Promising young players'):
+        Young = fifa_figures.cached_plotly('young', FINGERPRINT, young, clubs = clubs, **params)
+        count_top20 = len(PROMISING.query(clubs = clubs, **params))
+        count_all = len(PROMISING.query(**params))
+
+        st.markdown('### Count of Most Promising Young Players From Top Clubs and All over the World')
+        st.plotly_chart(Young)
+        st.write('''AS Monaco (France) has the highest number of promising players (9) and FC Barcelona (Spain) has the highest number of promising players (8) among Top-20 Clubs.\
+                  There are 59 Players under 20 in the Top 20 Clubs and 321 total player among all clubs who have high room of improvement 
+                  and the potential to become some of the Top players in the World.''')
+        st.write('With the thresholds from the side bar: {} Players in the selected Clubs and {} among all clubs.'.format(count_top20, count_all))
+
+        if st.checkbox('Show All Promising Players from Top 20 Clubs', False) and count_top20:
+            st.latex('Promising Players From Top 20 Clubs')
+            show_table('promising top 20', paged_table(VERSION, 'promising'), sort = 'Potential', group = promising_group(clubs = clubs, **params))
+
+        if st.checkbox('Show All Promising Players', False) and count_all:
+            st.latex('All Promising Players')
+            show_table('promising all', paged_table(VERSION, 'promising'), sort = 'Potential', group = promising_group(**params))
+
+    with fifa_sections.section('Promising players by value'):
+        st.markdown('## Scatter Plot of all Promising Players')
+        YPPC = fifa_figures.cached_plotly('YPP', FINGERPRINT, YPP, **params)
+
+        st.plotly_chart(YPPC)
+
+        if st.checkbox('Show All Promising Players by Value (Euro 💶)', False) and count_all:
+            st.latex('All Promising Players by Value')
+            columns = ('Age', 'Club', 'Nationality', 'Overall', 'Potential', 'Value(Euro)', 'Wage(Euro)', 'Position(s)')
+            show_table('promising by value', paged_table(VERSION, 'promising by value', columns), sort = 'Value(Euro)', ascending = True, group = promising_group(**params))
+
+# independent Plotly figures are built concurrently on a cold start
+PLOTLY_FIGURES = {
+    'all_players': all_players,
+    'attack_attributes': attack_attributes,
+    'top20_clubs': top20_clubs,
+    'MVPs': MVPs,
+    'top_ratings': top_ratings,
+    'bestgk': bestgk,
+    'young': young,
+    'YPP': YPP,
+}
+fifa_figures.warm_plotly(FINGERPRINT, PLOTLY_FIGURES)
+
+PAGES = {
+    'All Players': players_page,
+    'Player Comparison': comparison_page,
+    'Similar Players': similar_page,
+    'Best XI': squad_page,
+    'Attribute Correlations': correlations_page,
+    'Left v/s Right Footed': foot_page,
+    'Clubs & Top Players': clubs_page,
+    'Promising Young Players': young_page,
+    'Seasons': seasons_page,
+}
+
+page = st.sidebar.radio('Go to', list(PAGES))
+with fifa_sections.section(page):
+    PAGES[page]()
+
+if st.sidebar.checkbox('Show section timings', False):
+    fifa_sections.show_timings(st.sidebar)
+
+if fifa_sections.PROFILE:
+    st.sidebar.markdown('### Profile (all sessions)')
+    fifa_sections.show_profile(st.sidebar)
+    if st.sidebar.button('Export Chrome trace'):
+        # open in chrome://tracing or ui.perfetto.dev
+        trace = base64.b64encode(json.dumps(fifa_sections.chrome_trace()).encode()).decode()
+        st.sidebar.markdown('<a href="data:application/json;base64,{}" download="fifa_trace.json">Download fifa_trace.json</a>'.format(trace), unsafe_allow_html = True)
+    if st.sidebar.button('Clear profile'):
+        fifa_sections.clear_profile()
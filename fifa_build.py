@@ -0,0 +1,189 @@
+'''Offline build step for the dashboard aggregates.
+
+    python fifa_build.py [--csv players_20.csv] [--workers N] [--compact] [--force]
+
+Every aggregate the dashboard shows (correlation matrices, the aggregation cube,
+ranking permutations) is computed once, in parallel, and written as
+a versioned bundle of uncompressed feather files next to the table cache. At
+boot the app only memory-maps the bundle.
+'''
+import argparse
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from pyarrow import feather
+
+import fifa_cube
+import fifa_data
+import fifa_index
+import fifa_sections
+
+BUNDLE_VERSION = 5
+
+###########################################################################################################
+# Aggregates computed from the raw table
+GK_CORR_COLS = ['overall', 'potential', 'gk_diving', 'gk_handling', 'gk_speed', 'gk_reflexes', 'gk_kicking', 'gk_positioning', 'goalkeeping_diving', 'goalkeeping_handling', 'goalkeeping_kicking', 'goalkeeping_positioning', 'goalkeeping_reflexes']
+
+# players whose primary (first listed) position is a defensive one, e.g. 'CB, RB'
+DEFENSE_POS = ['CB','LB','RB']
+DEFENSE_CORR_COLS = ['overall', 'potential', 'defending', 'physic', 'pace', 'passing', 'dribbling', 'attacking_heading_accuracy', 'attacking_short_passing', 'skill_long_passing', 'skill_ball_control', 'movement_sprint_speed', 'movement_acceleration', 'movement_reactions', 'power_shot_power', 'power_jumping', 'power_stamina', 'power_strength', 'power_long_shots', 'defending_marking', 'defending_standing_tackle', 'defending_sliding_tackle',]
+
+ATTACK_POS = ['LS','RS','ST','CF','CAM','RM','LM','RW','LW','LAM','RAM']
+ATTACK_CORR_COLS = ['overall', 'potential', 'skill_moves', 'pace','shooting', 'passing', 'dribbling', 'physic',
+                   'attacking_crossing', 'attacking_finishing', 'attacking_heading_accuracy', 'attacking_short_passing',
+                   'attacking_volleys', 'skill_dribbling', 'skill_curve', 'skill_fk_accuracy', 'skill_long_passing',
+                   'skill_ball_control', 'movement_acceleration', 'movement_sprint_speed', 'movement_agility',
+                   'movement_reactions', 'movement_balance', 'power_shot_power', 'power_jumping', 'power_stamina',
+                   'power_strength', 'power_long_shots']
+
+def gk_corr(fifa):
+    gk_attributes = fifa_data.take_rows(fifa, None, GK_CORR_COLS)
+    gk_attributes = gk_attributes.dropna()
+    return gk_attributes.astype('float64').corr()
+
+def defense_corr(fifa):
+    defenders = fifa_index.PositionIndex(fifa['player_positions']).primary_in(DEFENSE_POS)
+    defense_attributes = fifa_data.take_rows(fifa, defenders, DEFENSE_CORR_COLS)
+    defense_attributes = defense_attributes.dropna()
+    return defense_attributes.astype('float64').corr()
+
+def attack_corr(fifa):
+    attackers = fifa_index.PositionIndex(fifa['player_positions']).primary_in(ATTACK_POS)
+    attack = fifa_data.take_rows(fifa, attackers, ATTACK_CORR_COLS)
+    attack = attack.dropna()
+    return attack.astype('float64').corr()
+
+###########################################################################################################
+# Aggregates computed from the dashboard frame
+TOP_CLUBS = ['Real Madrid', 'Manchester City', 'Tottenham Hotspur', 'Napoli',
+             'FC Barcelona', 'Juventus', 'Paris Saint-Germain', 'Liverpool',
+             'Manchester United', 'Chelsea', 'Atlético Madrid', 'Arsenal',
+             'Borussia Dortmund', 'FC Bayern München', 'West Ham United', 'FC Schalke 04',
+             'Roma', 'Leicester City', 'Inter', 'Milan']
+
+def rankings(data_all):
+    # descending row order of every ranked column; the leaderboards slice these (see fifa_index.RankingIndex)
+    return pd.DataFrame(dict((c, fifa_index.rank_order(fifa_index.column_values(data_all, c))) for c in fifa_index.RANKED_COLUMNS))
+
+# name -> (function, source frame)
+AGGREGATES = {
+    'gk_corr': (gk_corr, 'table'),
+    'defense_corr': (defense_corr, 'table'),
+    'attack_corr': (attack_corr, 'table'),
+    'cube': (fifa_cube.cube_cells, 'dashboard'),
+    'rankings': (rankings, 'dashboard'),
+}
+
+###########################################################################################################
+# Bundle layout: .fifa_cache/bundle_v<version>_<csv fingerprint>[_compact]/<aggregate>.feather + manifest.json
+INDEX_COL = '__index__'
+
+def bundle_dir(fingerprint, compact = fifa_data.COMPACT):
+    return os.path.join(fifa_data.CACHE_DIR, 'bundle_v{}_{}{}'.format(BUNDLE_VERSION, fingerprint[:16], '_compact' if compact else ''))
+
+def _source(path, compact, kind):
+    if kind == 'table':
+        return fifa_data.shared_table(path, compact)
+    return fifa_data.dashboard_view(fifa_data.shared_arrow(path, compact))
+
+def write_frame(frame, path):
+    # feather has no index: it is stored as a column and its name goes into the manifest
+    index_name = frame.index.name
+    frame = frame.rename_axis(INDEX_COL).reset_index()
+    frame.columns = [str(c) for c in frame.columns]
+    feather.write_feather(frame, path, compression = 'uncompressed')
+    return index_name
+
+def read_frame(path, index_name):
+    return fifa_data.map_table(path).set_index(INDEX_COL).rename_axis(index_name)
+
+def _compute(name, path, compact, out_dir):
+    func, kind = AGGREGATES[name]
+    return name, write_frame(func(_source(path, compact, kind)), os.path.join(out_dir, name + '.feather'))
+
+@fifa_sections.traced
+def build(path = fifa_data.CSV_PATH, compact = fifa_data.COMPACT, workers = None):
+    fingerprint = fifa_data.csv_fingerprint(path)
+    target = bundle_dir(fingerprint, compact)
+    tmp = '{}.{}.tmp'.format(target, os.getpid())
+    shutil.rmtree(tmp, ignore_errors = True)
+    os.makedirs(tmp)
+
+    # make sure the table cache exists before the workers map it
+    fifa_data.shared_table(path, compact)
+    names = list(AGGREGATES)
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        index_names = dict(pool.map(_compute, names, [path] * len(names), [compact] * len(names), [tmp] * len(names)))
+
+    manifest = {'version': BUNDLE_VERSION, 'fingerprint': fingerprint, 'csv': list(fifa_data.table_version(path)),
+                'compact': compact, 'index_names': index_names}
+    with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent = 2)
+
+    shutil.rmtree(target, ignore_errors = True)
+    os.replace(tmp, target)
+    return target
+
+def find_bundle(path = fifa_data.CSV_PATH, compact = fifa_data.COMPACT):
+    # cheap lookup by the CSV's size/mtime recorded in the manifest, falls back to hashing the CSV
+    version = list(fifa_data.table_version(path))
+    prefix = 'bundle_v{}_'.format(BUNDLE_VERSION)
+    if os.path.isdir(fifa_data.CACHE_DIR):
+        for entry in os.listdir(fifa_data.CACHE_DIR):
+            manifest = os.path.join(fifa_data.CACHE_DIR, entry, 'manifest.json')
+            if not entry.startswith(prefix) or not os.path.exists(manifest):
+                continue
+            with open(manifest) as f:
+                info = json.load(f)
+            if info['csv'] == version and info['compact'] == compact:
+                return os.path.join(fifa_data.CACHE_DIR, entry)
+    target = bundle_dir(fifa_data.csv_fingerprint(path), compact)
+    return target if os.path.exists(os.path.join(target, 'manifest.json')) else None
+
+###########################################################################################################
+# Loading (memory-mapped, shared by every session in the process)
+_BUNDLES = {}
+_BUNDLES_LOCK = threading.Lock()
+
+@fifa_sections.traced
+def read_bundle(target):
+    with open(os.path.join(target, 'manifest.json')) as f:
+        manifest = json.load(f)
+    bundle = {}
+    for name, index_name in manifest['index_names'].items():
+        bundle[name] = read_frame(os.path.join(target, name + '.feather'), index_name)
+    return bundle
+
+def load_bundle(path = fifa_data.CSV_PATH, compact = fifa_data.COMPACT):
+    version = fifa_data.table_version(path)
+    key = (version, compact)
+    if key in _BUNDLES:
+        return _BUNDLES[key]
+    with _BUNDLES_LOCK:
+        if key not in _BUNDLES:
+            target = find_bundle(path, compact) or build(path, compact)
+            _BUNDLES[key] = read_bundle(target)
+    return _BUNDLES[key]
+
+###########################################################################################################
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Precompute the FIFA-20 dashboard aggregates.')
+    parser.add_argument('--csv', default = fifa_data.CSV_PATH, help = 'path of players_20.csv')
+    parser.add_argument('--workers', type = int, default = None, help = 'size of the process pool')
+    parser.add_argument('--compact', action = 'store_true', default = fifa_data.COMPACT, help = 'build from the compact table')
+    parser.add_argument('--force', action = 'store_true', help = 'rebuild even if a bundle for this CSV exists')
+    args = parser.parse_args(argv)
+
+    target = None if args.force else find_bundle(args.csv, args.compact)
+    if target is None:
+        target = build(args.csv, args.compact, args.workers)
+        print('built', target)
+    else:
+        print('up to date', target)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+'''Player comparison on top of a numeric attribute matrix.
+
+The comparison frame is turned once into a float32 matrix (players x
+attributes). Comparing any number of players (rows, see fifa_search) on
+any number of attributes is then a single gather and a single figure, and
+SimilarityIndex answers "who plays like this player?" over the same matrix.
+'''
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+def numeric_attribute(series):
+    # numbers only (the per-position ratings are already numbers, see fifa_data.parse_ratings); text is not comparable
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype = 'float64', na_value = np.nan)
+    return None
+
+###########################################################################################################
+class ComparisonEngine:
+
+    def __init__(self, frame, attributes, name_column = 'Name'):
+        columns, values = [], []
+        for a in attributes:
+            if a not in frame.columns:
+                continue
+            v = numeric_attribute(frame[a])
+            if v is not None:
+                columns.append(a)
+                values.append(v)
+        self.attributes = columns
+        self._column = dict((a, j) for j, a in enumerate(columns))
+        self.matrix = np.column_stack(values).astype('float32')
+
+        # per-attribute maximum over all players, used to put attributes on a common 0-100 scale
+        with np.errstate(all = 'ignore'):
+            scale = np.nanmax(np.abs(self.matrix), axis = 0)
+        scale[~np.isfinite(scale) | (scale == 0)] = 1
+        self.scale = scale
+
+        # display names per row (short names are not unique: players are selected by row, see fifa_search)
+        self.names = frame[name_column].to_numpy(dtype = object)
+
+    def comparable(self, attributes):
+        return [a for a in attributes if a in self._column]
+
+    def column(self, attribute):
+        return self.matrix[:, self._column[attribute]]
+
+    def gather(self, rows, attributes, normalize = False):
+        attributes = self.comparable(attributes)
+        columns = [self._column[a] for a in attributes]
+        values = self.matrix[np.ix_(rows, columns)]
+        if normalize:
+            values = values / self.scale[columns] * 100
+        return pd.DataFrame(values, index = pd.Index(self.names[rows], name = 'Name'), columns = attributes)
+
+    def figure(self, rows, attributes, kind = 'bars', normalize = False):
+        table = self.gather(rows, attributes, normalize = normalize or kind == 'radar')
+        fig = go.Figure()
+        for name, values in zip(table.index, table.values):
+            if kind == 'radar':
+                theta = list(table.columns)
+                fig.add_trace(go.Scatterpolar(r = np.append(values, values[:1]), theta = theta + theta[:1], fill = 'toself', name = name))
+            else:
+                fig.add_trace(go.Bar(x = table.columns, y = values, name = name))
+        if kind == 'radar':
+            fig.update_layout(polar = dict(radialaxis = dict(visible = True, range = [0, 100])))
+        else:
+            fig.update_layout(barmode = 'group', yaxis_title = '% of the best player' if normalize else None)
+        return fig
+
+###########################################################################################################
+# Similar players: nearest neighbours over z-scored playing attributes
+# (bio and money columns are used as filters, not as part of the profile)
+PROFILE_EXCLUDE = ['Age', 'Height(cm)', 'Weight(kg)', 'Value(Euro)', 'Wage(Euro)', 'Release Clause Eur', 'International Reputation']
+BRUTE_FORCE_LIMIT = 50000       # above this many players: KD-tree over a PCA projection
+TREE_DIMS = 16
+OVERSAMPLE = 8
+BATCH_CHUNK = 256
+
+class SimilarityIndex:
+
+    def __init__(self, engine, exclude = PROFILE_EXCLUDE, brute_force_limit = BRUTE_FORCE_LIMIT):
+        columns = [j for a, j in engine._column.items() if a not in exclude]
+        X = engine.matrix[:, columns].astype('float64')
+        with np.errstate(all = 'ignore'):
+            mean = np.nanmean(X, axis = 0)
+            std = np.nanstd(X, axis = 0)
+        mean[~np.isfinite(mean)] = 0
+        std[~np.isfinite(std) | (std == 0)] = 1
+        X = (X - mean) / std
+        # a missing attribute (e.g. gk_* for outfield players) counts as average
+        X[np.isnan(X)] = 0
+
+        self.engine = engine
+        self.vectors = X.astype('float32')
+        self.sq_norms = (self.vectors.astype('float64') ** 2).sum(axis = 1)
+        self.brute_force_limit = brute_force_limit
+        self.tree = None
+        if len(X) > brute_force_limit:
+            from scipy.spatial import cKDTree
+            sample = X[np.random.RandomState(0).choice(len(X), min(len(X), 20000), replace = False)]
+            _, _, vt = np.linalg.svd(sample - sample.mean(axis = 0), full_matrices = False)
+            self.projection = vt[:TREE_DIMS].T.astype('float32')
+            self.tree = cKDTree(self.vectors @ self.projection)
+
+    def _distances(self, row, rows):
+        diff = self.vectors[rows] - self.vectors[row]
+        return np.sqrt(np.einsum('ij,ij->i', diff, diff))
+
+    def _nearest(self, row, rows, k):
+        rows = rows[rows != row]
+        d = self._distances(row, rows)
+        k = min(k, len(rows))
+        if k == 0:
+            return rows[:0], d[:0]
+        part = np.argpartition(d, k - 1)[:k]
+        part = part[np.argsort(d[part], kind = 'stable')]
+        return rows[part], d[part]
+
+    def query(self, row, k = 10, candidates = None):
+        # candidates: optional boolean mask (position / value / age filters)
+        n = len(self.vectors)
+        if self.tree is None or (candidates is not None and candidates.sum() <= self.brute_force_limit):
+            rows = np.arange(n) if candidates is None else np.flatnonzero(candidates)
+            return self._nearest(row, rows, k)
+
+        # first candidates from the tree, re-ranked exactly; widen until enough pass the filters
+        point = self.vectors[row] @ self.projection
+        fetch = k * OVERSAMPLE
+        while True:
+            _, found = self.tree.query(point, min(fetch, n))
+            found = np.atleast_1d(found)
+            found = found[found < n]
+            if candidates is not None:
+                found = found[candidates[found]]
+            rows, d = self._nearest(row, found, k)
+            if len(rows) >= k:
+                break
+            if fetch >= n:
+                return rows, d
+            fetch *= 4
+        # the projection is orthonormal, so a projected distance is never more than the true one: every player
+        # closer than the k-th found lies within that radius of the point in the projection, and re-ranking them
+        # is exact. This is tree.query_ball_point(point, radius) as one vectorized pass: with 16 of the ~70
+        # dimensions the ball holds most of the rows, and building it through the tree is slower.
+        radius = float(d[-1]) * (1 + 1e-5) + 1e-5
+        diff = self.tree.data - point
+        ball = np.flatnonzero(np.einsum('ij,ij->i', diff, diff) <= radius * radius)
+        if candidates is not None:
+            ball = ball[candidates[ball]]
+        return self._nearest(row, ball, k)
+
+    def _batch_chunk(self, rows, pool, k):
+        # squared distances for a chunk of queries against the whole pool in one matrix product
+        d2 = self.sq_norms[rows][:, None] + self.sq_norms[pool][None, :] - 2 * (self.vectors[rows] @ self.vectors[pool].T)
+        d2[rows[:, None] == pool[None, :]] = np.inf
+        part = np.argpartition(d2, k - 1, axis = 1)[:, :k]
+        part_d = np.take_along_axis(d2, part, axis = 1)
+        order = np.argsort(part_d, axis = 1, kind = 'stable')
+        part = np.take_along_axis(part, order, axis = 1)
+        return pool[part], np.sqrt(np.maximum(np.take_along_axis(part_d, order, axis = 1), 0))
+
+    def batch(self, rows, k = 5, candidates = None, workers = None):
+        # numpy releases the GIL in the matrix products, so the chunks run on all cores
+        rows = np.asarray(rows)
+        pool = np.arange(len(self.vectors)) if candidates is None else np.flatnonzero(candidates)
+        # a player is never its own match: with a small pool, k shrinks so that no row returns itself (at inf)
+        k = max(0, min(k, len(pool) - int(np.isin(rows, pool).any())))
+        chunks = [rows[i:i + BATCH_CHUNK] for i in range(0, len(rows), BATCH_CHUNK)]
+        if not chunks or k == 0:
+            return np.empty((len(rows), k), dtype = np.intp), np.empty((len(rows), k))
+        with ThreadPoolExecutor(max_workers = workers or os.cpu_count()) as executor:
+            results = list(executor.map(lambda chunk: self._batch_chunk(chunk, pool, k), chunks))
+        return np.vstack([r[0] for r in results]), np.vstack([r[1] for r in results])
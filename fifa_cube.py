@@ -0,0 +1,89 @@
+'''Aggregation cube over Club x Nationality x primary position x age band.
+
+Every non-empty cell keeps count, sum, min and max of a few key metrics.
+Any group-by over these dimensions (club value totals, wage bill by nation,
+mean Overall by position per club...) is then a rollup of the cells: the
+row-level table is not scanned again. fifa_build stores the cells in the
+bundle; AggregationCube answers rollups and slices on top of them.
+'''
+import numpy as np
+import pandas as pd
+
+import fifa_index
+
+DIMENSIONS = ['Club', 'Nationality', 'Position', 'Age band']
+METRICS = ['Overall', 'Potential', 'Value(Euro)', 'Wage(Euro)', 'Age']
+STATS = ['count', 'sum', 'mean', 'min', 'max']
+
+# upper bound (inclusive) of each age band
+AGE_EDGES = [20, 23, 26, 29, 32]
+AGE_BANDS = ['-20', '21-23', '24-26', '27-29', '30-32', '33+']
+
+def age_band(age):
+    age = np.asarray(age, dtype = 'float64')
+    bands = np.array(AGE_BANDS + ['-'], dtype = object)
+    codes = np.searchsorted(AGE_EDGES, age, side = 'left')
+    codes[np.isnan(age)] = len(AGE_BANDS)
+    return bands[codes]
+
+def cube_cells(data_all):
+    # one row per non-empty cell: the dimensions, the player count and count/sum/min/max per metric
+    positions = fifa_index.PositionIndex(data_all['Position(s)'])
+    keys = pd.DataFrame({
+        'Club': data_all['Club'].to_numpy(dtype = object),
+        'Nationality': data_all['Nationality'].to_numpy(dtype = object),
+        'Position': np.array(fifa_index.POSITIONS + ['-'], dtype = object)[positions.primary],
+        'Age band': age_band(fifa_index.column_values(data_all, 'Age')),
+    })
+    keys = keys.fillna('-')
+    spec = {'players': ('Club', 'size')}
+    for m in METRICS:
+        keys[m] = fifa_index.column_values(data_all, m)
+        for stat in ('count', 'sum', 'min', 'max'):
+            spec['{} {}'.format(m, stat)] = (m, stat)
+    return keys.groupby(DIMENSIONS, sort = False).agg(**spec).reset_index()
+
+###########################################################################################################
+class AggregationCube:
+
+    def __init__(self, cells):
+        self.cells = cells
+        self._rollups = {}
+
+    def members(self, dimension):
+        return sorted(self.cells[dimension].unique())
+
+    def slice(self, filters):
+        # filters: {dimension: allowed values}; an empty selection keeps the dimension whole
+        keep = np.ones(len(self.cells), dtype = bool)
+        for dimension, values in filters.items():
+            if len(values):
+                keep &= self.cells[dimension].isin(list(values)).to_numpy()
+        return AggregationCube(self.cells[keep])
+
+    def rollup(self, dimensions = ()):
+        # every statistic of every metric, grouped by the given dimensions (none: the grand total)
+        dimensions = tuple(dimensions)
+        if dimensions in self._rollups:
+            return self._rollups[dimensions]
+        cells = self.cells
+        if not dimensions:
+            cells = cells.assign(total = 'All')
+        grouped = cells.groupby(list(dimensions) or ['total'], sort = False)
+        columns = ['players']
+        for m in METRICS:
+            columns += ['{} count'.format(m), '{} sum'.format(m)]
+        table = grouped[columns].sum()
+        for m in METRICS:
+            table['{} min'.format(m)] = grouped['{} min'.format(m)].min()
+            table['{} max'.format(m)] = grouped['{} max'.format(m)].max()
+            with np.errstate(all = 'ignore'):
+                table['{} mean'.format(m)] = table['{} sum'.format(m)] / table['{} count'.format(m)]
+        self._rollups[dimensions] = table
+        return table
+
+    def measure(self, dimensions, metric, stat = 'sum'):
+        # one statistic as a Series, largest first
+        table = self.rollup(dimensions)
+        column = 'players' if stat == 'count' else '{} {}'.format(metric, stat)
+        return table[column].rename('{} ({})'.format(metric, stat) if stat != 'count' else 'Players').sort_values(ascending = False, kind = 'mergesort')
@@ -0,0 +1,272 @@
+'''Single ingest stage for players_20.csv.
+
+The CSV is parsed once against a declared schema and kept as an uncompressed
+feather file keyed on the CSV's hash. That file is memory-mapped into a
+process-wide store, and the dashboard frame and the comparison frame are both
+derived from the one shared table.
+'''
+import hashlib
+import os
+import string
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+import fifa_sections
+
+CSV_PATH = 'players_20.csv'
+CACHE_DIR = '.fifa_cache'
+
+# opt-in compact representation (small ints, categoricals), e.g. FIFA_COMPACT=1 streamlit run FIFA_App.py
+COMPACT = os.environ.get('FIFA_COMPACT', '') not in ('', '0')
+
+###########################################################################################################
+# Declared schema (only the columns the app uses, in the order they appear in the CSV)
+# sofifa_id is the only unique key: short names repeat
+ID_COLS = ['sofifa_id']
+
+TEXT_COLS = ['short_name', 'long_name', 'dob', 'nationality', 'club', 'player_positions', 'preferred_foot',
+             'work_rate', 'body_type', 'team_position', 'nation_position', 'player_traits']
+
+# 'ls' ... 'rb' are stored as strings like '89+2' in players_20.csv; the cache keeps them as numbers (see parse_ratings)
+POSITION_RATING_COLS = ['ls', 'st', 'rs', 'lw', 'lf', 'cf', 'rf', 'rw', 'lam', 'cam', 'ram', 'lm', 'lcm', 'cm', 'rcm',
+                        'rm', 'lwb', 'ldm', 'cdm', 'rdm', 'rwb', 'lb', 'lcb', 'cb', 'rcb', 'rb']
+
+INT_COLS = ['age', 'height_cm', 'weight_kg', 'overall', 'potential', 'value_eur', 'wage_eur', 'international_reputation',
+            'weak_foot', 'skill_moves', 'attacking_crossing', 'attacking_finishing', 'attacking_heading_accuracy',
+            'attacking_short_passing', 'attacking_volleys', 'skill_dribbling', 'skill_curve', 'skill_fk_accuracy',
+            'skill_long_passing', 'skill_ball_control', 'movement_acceleration', 'movement_sprint_speed',
+            'movement_agility', 'movement_reactions', 'movement_balance', 'power_shot_power', 'power_jumping',
+            'power_stamina', 'power_strength', 'power_long_shots', 'mentality_aggression', 'mentality_interceptions',
+            'mentality_positioning', 'mentality_vision', 'mentality_penalties', 'mentality_composure',
+            'defending_marking', 'defending_standing_tackle', 'defending_sliding_tackle', 'goalkeeping_diving',
+            'goalkeeping_handling', 'goalkeeping_kicking', 'goalkeeping_positioning', 'goalkeeping_reflexes']
+
+# numeric columns with gaps (GKs have no pace..physic, outfield players have no gk_*)
+FLOAT_COLS = ['release_clause_eur', 'team_jersey_number', 'nation_jersey_number', 'pace', 'shooting', 'passing',
+              'dribbling', 'defending', 'physic', 'gk_diving', 'gk_handling', 'gk_kicking', 'gk_reflexes', 'gk_speed',
+              'gk_positioning']
+
+SCHEMA = dict([(c, 'int64') for c in ID_COLS] +
+              [(c, 'object') for c in TEXT_COLS + POSITION_RATING_COLS] +
+              [(c, 'int64') for c in INT_COLS] +
+              [(c, 'float64') for c in FLOAT_COLS])
+
+# bump when build_cache changes what it stores for the same CSV and schema
+CACHE_LAYOUT = 2
+
+###########################################################################################################
+def csv_fingerprint(path = CSV_PATH):
+    # the schema is part of the key so that changing it invalidates old cache files
+    h = hashlib.sha1(repr((sorted(SCHEMA.items()), CACHE_LAYOUT)).encode())
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def cache_path(fingerprint, compact = False):
+    return os.path.join(CACHE_DIR, 'players_{}{}.feather'.format(fingerprint[:16], '_compact' if compact else ''))
+
+def parse_ratings(series):
+    # '89+2' -> 91 (base + boost); empty (goalkeepers) or unreadable -> NaN
+    # there are only a few hundred distinct strings, so each is parsed once
+    codes, uniques = pd.factorize(series)
+    parts = pd.Series(uniques, dtype = object).str.extract(r'^\s*(\d+)\s*([+-]\s*\d+)?\s*$')
+    base = pd.to_numeric(parts[0], errors = 'coerce')
+    boost = pd.to_numeric(parts[1].str.replace(' ', ''), errors = 'coerce').fillna(0)
+    # missing values (code -1) pick the trailing NaN
+    values = np.append((base + boost).to_numpy(dtype = 'float64'), np.nan)
+    return pd.Series(values[codes], index = series.index, name = series.name)
+
+@fifa_sections.traced
+def build_cache(path, cached, compact):
+    table = pd.read_csv(path, usecols = list(SCHEMA), dtype = SCHEMA)
+    for c in POSITION_RATING_COLS:
+        table[c] = parse_ratings(table[c])
+    if compact:
+        before = memory_footprint(table)
+        table = compact_table(table)
+        after = memory_footprint(table)
+        print('players table: {:.1f} MB -> {:.1f} MB ({:.1f}x smaller)'.format(before / 2**20, after / 2**20, before / after))
+
+    # uncompressed so that the file can be memory-mapped instead of decoded
+    os.makedirs(CACHE_DIR, exist_ok = True)
+    tmp = '{}.{}.tmp'.format(cached, os.getpid())
+    feather.write_feather(table, tmp, compression = 'uncompressed')
+    os.replace(tmp, cached)
+
+def map_arrow(cached):
+    return feather.read_table(cached, memory_map = True)
+
+def arrow_frame(arrow, columns = None):
+    # numeric columns without gaps point straight into the mapped pages (one block per column, never consolidated)
+    if columns is not None:
+        # the pandas metadata comes along, so nullable and categorical columns keep their dtype
+        arrow = pa.Table.from_arrays([arrow.column(c) for c in columns], names = list(columns), metadata = arrow.schema.metadata)
+    return arrow.to_pandas(split_blocks = True)
+
+def take_rows(frame, rows = None, columns = None):
+    # row subset built column by column: iloc/take/frame[mask]/frame[list] on the frame itself would consolidate
+    # it in place (a shared view would then hold private heap copies of every column); rows: positions, a
+    # boolean mask or None for all of them
+    columns = list(frame.columns if columns is None else columns)
+    rows = np.arange(len(frame)) if rows is None else np.asarray(rows)
+    if rows.dtype == bool:
+        rows = np.flatnonzero(rows)
+    return pd.DataFrame(dict((c, frame[c].array.take(rows)) for c in columns), index = frame.index.take(rows), columns = columns)
+
+def block_count(frame):
+    # number of pandas blocks: a view built by arrow_frame has one per column until something consolidates it
+    return len(frame._data.blocks)
+
+@fifa_sections.traced
+def map_table(cached):
+    return arrow_frame(map_arrow(cached))
+
+def read_arrow(path = CSV_PATH, compact = COMPACT):
+    cached = cache_path(csv_fingerprint(path), compact)
+    if not os.path.exists(cached):
+        build_cache(path, cached, compact)
+    return map_arrow(cached)
+
+###########################################################################################################
+# Process-wide store: every session (and every worker on the host, through the page cache) shares one mapped table
+_STORE = {}
+_STORE_LOCK = threading.Lock()
+
+_GENERATIONS = {}
+
+def table_version(path = CSV_PATH):
+    # cheap stat instead of re-hashing the CSV on every rerun; invalidate() bumps the generation
+    path = os.path.abspath(path)
+    info = os.stat(path)
+    return (path, info.st_mtime_ns, info.st_size, _GENERATIONS.get(path, 0))
+
+def _shared(path, compact):
+    # (version, mapped Arrow table, pandas frame over it)
+    version = table_version(path)
+    key = (version[0], compact)
+    entry = _STORE.get(key)
+    if entry is not None and entry[0] == version:
+        return entry
+
+    with _STORE_LOCK:
+        entry = _STORE.get(key)
+        if entry is None or entry[0] != version:
+            arrow = read_arrow(path, compact)
+            entry = (version, arrow, arrow_frame(arrow))
+            _STORE[key] = entry
+    return entry
+
+def shared_table(path = CSV_PATH, compact = COMPACT):
+    # read-only: selecting several columns (table[[...]], drop) would consolidate it into private heap copies
+    return _shared(path, compact)[2]
+
+def shared_arrow(path = CSV_PATH, compact = COMPACT):
+    # the views are built from this, column by column
+    return _shared(path, compact)[1]
+
+_FINGERPRINTS = {}
+
+def data_fingerprint(path = CSV_PATH):
+    # content hash of the CSV, computed once per table version
+    version = table_version(path)
+    if version not in _FINGERPRINTS:
+        _FINGERPRINTS[version] = csv_fingerprint(path)
+    return _FINGERPRINTS[version]
+
+def invalidate(path = None):
+    # call when players_20.csv is replaced in place (e.g. same size and mtime): with a new generation every
+    # cache keyed on the table version misses (st.cache, the memo store, fingerprints, bundles, summaries)
+    with _STORE_LOCK:
+        if path is None:
+            paths = set(key[0] for key in _STORE) | set(_GENERATIONS) | {os.path.abspath(CSV_PATH)}
+        else:
+            paths = {os.path.abspath(path)}
+        for p in paths:
+            _GENERATIONS[p] = _GENERATIONS.get(p, 0) + 1
+        for key in list(_STORE):
+            if key[0] in paths:
+                del _STORE[key]
+    # entries of the old generation would never be asked for again
+    fifa_sections.clear_memo()
+
+###########################################################################################################
+# Compact representation
+# every attribute is an integer from 0 to 99, so int8 is enough; columns with gaps use the nullable types
+COMPACT_DTYPES = dict([(c, 'int8') for c in INT_COLS] +
+                      [(c, 'Int8') for c in FLOAT_COLS + POSITION_RATING_COLS])
+COMPACT_DTYPES.update({'sofifa_id': 'int32', 'height_cm': 'int16', 'weight_kg': 'int16', 'value_eur': 'int32', 'wage_eur': 'int32',
+                       'release_clause_eur': 'Int32'})
+
+CATEGORY_COLS = ['nationality', 'club', 'player_positions', 'preferred_foot', 'work_rate', 'body_type', 'team_position',
+                 'nation_position', 'dob', 'player_traits']
+
+def memory_footprint(frame):
+    return int(frame.memory_usage(index = True, deep = True).sum())
+
+def compact_table(table):
+    table = table.astype(dict((c, t) for c, t in COMPACT_DTYPES.items() if c in table.columns))
+    for c in CATEGORY_COLS:
+        if c in table.columns:
+            table[c] = table[c].astype('category')
+    # names stay plain strings: the frames are rebuilt from Arrow, where to_pandas already shares repeated ones
+    return table
+
+###########################################################################################################
+# Dashboard frame (indexed by short_name, friendly column names)
+DASHBOARD_COLS = ['long_name', 'age', 'club', 'nationality', 'overall', 'potential', 'value_eur',
+                  'wage_eur', 'player_positions', 'preferred_foot', 'international_reputation', 'weak_foot', 'skill_moves', 'work_rate', 'body_type',
+                  'release_clause_eur', 'team_position', 'team_jersey_number', 'nation_position', 'nation_jersey_number', 'pace', 'shooting', 'passing', 'dribbling', 'defending',
+                  'physic', 'attacking_crossing', 'attacking_finishing', 'attacking_heading_accuracy', 'attacking_short_passing',
+                  'attacking_volleys', 'skill_dribbling', 'skill_curve', 'skill_fk_accuracy', 'skill_long_passing', 'skill_ball_control',
+                  'movement_acceleration', 'movement_sprint_speed', 'movement_agility', 'movement_reactions', 'movement_balance', 'power_shot_power', 'power_jumping',
+                  'power_stamina', 'power_strength', 'power_long_shots', 'mentality_aggression', 'mentality_interceptions', 'mentality_positioning', 'mentality_vision', 'mentality_penalties',
+                  'mentality_composure', 'defending_marking', 'defending_standing_tackle', 'defending_sliding_tackle', 'goalkeeping_handling']
+
+DASHBOARD_NAMES = ['Full_Name', 'Age', 'Club', 'Nationality', 'Overall', 'Potential', 'Value(Euro)', 'Wage(Euro)', 'Position(s)', 'Foot', 'International Reputation', 'Weak Foot', 'Skill Moves', 'Work Rate', 'Body Type', 'Release Clause', 'Team Pos', 'Jersey No.', 'National Pos', 'National Jersey No.',
+                   'Pace', 'Shooting', 'Passing', 'Dribbling', 'Defending', 'Physic'] + DASHBOARD_COLS[26:]
+
+@fifa_sections.traced
+def dashboard_view(arrow):
+    # arrow: the mapped table (shared_arrow); its numeric columns stay mapped in the view
+    fifa = arrow_frame(arrow, DASHBOARD_COLS)
+    fifa.columns = DASHBOARD_NAMES
+    fifa.index = pd.Index(arrow_frame(arrow, ['short_name'])['short_name'], name = 'short_name')
+
+    # only text columns get the '-' placeholder, numeric columns keep their dtype
+    for c in fifa.columns:
+        if pd.api.types.is_numeric_dtype(fifa[c].dtype) or not fifa[c].isna().any():
+            continue
+        if hasattr(fifa[c], 'cat'):
+            fifa[c] = fifa[c].cat.add_categories('-')
+        fifa[c] = fifa[c].fillna('-')
+    return fifa
+
+###########################################################################################################
+# Comparison frame (RangeIndex starting at 1, 'Name' and 'Clubs' columns)
+COMPARISON_DROP = ['sofifa_id', 'long_name', 'body_type', 'team_jersey_number', 'nation_jersey_number']
+
+def rena(a):                       # function to rename columns
+    if a=='club':
+        return 'Clubs'
+    if a=='short_name':
+        return 'Name'
+    if len(a)==2 or len(a)==3 and a!='age':
+        a = a.upper()
+    else:
+        a = a.replace('_',' ')
+        a = string.capwords(a)
+    return a
+
+@fifa_sections.traced
+def comparison_view(arrow):
+    fifa_org = arrow_frame(arrow, [c for c in arrow.column_names if c not in COMPARISON_DROP])
+    names = {'Height Cm':'Height(cm)','Weight Kg':'Weight(kg)','Value Eur':'Value(Euro)', 'Wage Eur':'Wage(Euro)'}
+    fifa_org.columns = [names.get(rena(c), rena(c)) for c in fifa_org.columns]
+
+    fifa_org.index = pd.RangeIndex(1, len(fifa_org) + 1)
+    return fifa_org
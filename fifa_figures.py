@@ -0,0 +1,288 @@
+'''Figure caches for FIFA_App.py.
+
+Rendered matplotlib/seaborn figures are kept as PNG bytes and Plotly figures
+as their serialized JSON, each in an LRU cache with a size cap, mirrored on
+disk so that a warm restart can serve them without drawing (or even importing
+matplotlib).
+'''
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import plotly.graph_objects as go
+
+import fifa_build
+import fifa_data
+import fifa_sections
+
+FIGURE_DIR = os.path.join(fifa_data.CACHE_DIR, 'figures')
+MEMORY_LIMIT = 64 * 2**20
+DISK_LIMIT = 256 * 2**20
+
+###########################################################################################################
+class RenderCache:
+
+    def __init__(self, directory = FIGURE_DIR, memory_limit = MEMORY_LIMIT, disk_limit = DISK_LIMIT, suffix = '.png'):
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _remember(self, key, data):
+        # caller holds the lock
+        if key in self._items:
+            self._items.move_to_end(key)
+            return
+        self._items[key] = data
+        self._size += len(data)
+        while self._size > self.memory_limit and len(self._items) > 1:
+            _, old = self._items.popitem(last = False)
+            self._size -= len(old)
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+        try:
+            os.makedirs(self.directory, exist_ok = True)
+            tmp = '{}.{}.tmp'.format(self._path(key), threading.get_ident())
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+            self._trim_disk()
+        except OSError:
+            # the in-memory copy is still served
+            pass
+
+    def _trim_disk(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                info = os.stat(os.path.join(self.directory, name))
+                files.append((info.st_mtime, info.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.disk_limit:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+def call_params(draw, params = None):
+    # explicit arguments equal to the defaults share a key with a call that omits them
+    code = draw.__code__
+    names = code.co_varnames[:code.co_argcount]
+    defaults = draw.__defaults__ or ()
+    full = dict(zip(names[len(names) - len(defaults):], defaults))
+    full.update(params or {})
+    return full
+
+def figure_key(name, fingerprint, draw, params = None):
+    # the drawing code is part of the key so that editing a plot invalidates its cached image;
+    # the bundle version too, since figures draw the precomputed aggregates (e.g. the correlation matrices)
+    h = hashlib.sha1()
+    for part in (name, fingerprint, fifa_build.BUNDLE_VERSION, draw.__code__.co_code, repr(draw.__code__.co_consts),
+                 repr(sorted(call_params(draw, params).items()))):
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+    return '{}_{}'.format(name, h.hexdigest()[:20])
+
+###########################################################################################################
+# matplotlib / seaborn
+PNG_CACHE = RenderCache()
+
+# pyplot and seaborn draw through global state (current figure, rcParams): one figure at a time
+_RENDER_LOCK = threading.RLock()
+
+def render_png(draw, **params):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    with _RENDER_LOCK:
+        before = set(plt.get_fignums())
+        # style changes (sns.set, plt.style.use) stay inside this figure
+        with matplotlib.rc_context():
+            draw(**params)
+            created = [n for n in plt.get_fignums() if n not in before]
+            fig = plt.figure(created[-1]) if created else plt.gcf()
+            buf = io.BytesIO()
+            fig.savefig(buf, format = 'png', bbox_inches = 'tight')
+        for n in created:
+            plt.close(n)
+    return buf.getvalue()
+
+def cached_png(name, fingerprint, draw, **params):
+    key = figure_key(name, fingerprint, draw, params)
+    data = PNG_CACHE.get(key)
+    if data is None:
+        with _RENDER_LOCK:
+            # another session may have drawn it while this one waited
+            data = PNG_CACHE.get(key)
+            if data is None:
+                with fifa_sections.span(name, 'render png'):
+                    data = render_png(draw, **params)
+                PNG_CACHE.put(key, data)
+    fifa_sections.gauge('png ' + name, len(data))
+    return data
+
+###########################################################################################################
+# Plotly: each figure is built once per data version and kept as JSON
+JSON_CACHE = RenderCache(directory = os.path.join(fifa_data.CACHE_DIR, 'plotly'), suffix = '.json')
+
+fifa_sections.register_counter('png cache', lambda: (PNG_CACHE.hits, PNG_CACHE.misses))
+fifa_sections.register_counter('plotly cache', lambda: (JSON_CACHE.hits, JSON_CACHE.misses))
+
+_POOL = ThreadPoolExecutor(max_workers = 4)
+_PENDING = {}
+_PENDING_LOCK = threading.Lock()
+
+def _build_json(key, build, params):
+    with fifa_sections.span(build.__name__, 'build figure'):
+        fig = build(**params)
+    with fifa_sections.span(build.__name__, 'to_json'):
+        data = fig.to_json().encode()
+    JSON_CACHE.put(key, data)
+    return data
+
+def _submit(key, build, params):
+    # concurrent requests for the same figure share one build
+    with _PENDING_LOCK:
+        future = _PENDING.get(key)
+        if future is not None:
+            return future
+        future = _PENDING[key] = _POOL.submit(_build_json, key, build, params)
+    future.add_done_callback(lambda f: _PENDING.pop(key, None))
+    return future
+
+def cached_plotly(name, fingerprint, build, **params):
+    key = figure_key(name, fingerprint, build, params)
+    data = JSON_CACHE.get(key)
+    if data is None:
+        data = _submit(key, build, params).result()
+    fifa_sections.gauge('plotly ' + name, len(data))
+    return json.loads(data.decode())
+
+def warm_plotly(fingerprint, builders):
+    # start building every missing figure in the background; cached_plotly() waits for its own
+    for name, build in builders.items():
+        key = figure_key(name, fingerprint, build)
+        if JSON_CACHE.get(key) is None:
+            _submit(key, build, {})
+
+###########################################################################################################
+# Scatter plots that stay bounded in payload and render time as the number of rows grows
+WEBGL_THRESHOLD = 5000          # above this many points: WebGL instead of SVG
+BINNING_THRESHOLD = 100000      # above this many points: server-side density grid
+GRID_BINS = 80
+SPARSE_BIN = 2                  # points in bins this sparse are drawn individually
+MAX_OUTLIERS = 1000
+
+def scatter_mode(n):
+    if n <= WEBGL_THRESHOLD:
+        return 'svg'
+    if n <= BINNING_THRESHOLD:
+        return 'webgl'
+    return 'binned'
+
+def scalable_scatter(x, y, color, text, size = 16, colorscale = 'Plasma', color_name = 'Age'):
+    mode = scatter_mode(len(x))
+    if mode == 'binned':
+        return binned_scatter(x, y, color, text, colorscale = colorscale, color_name = color_name)
+
+    trace = go.Scatter if mode == 'svg' else go.Scattergl
+    return [trace(
+        x = x,
+        y = y,
+        mode='markers',
+        marker=dict(
+            size=size,
+            color=color, #set color equal to a variable
+            colorscale=colorscale, # one of plotly colorscales
+            showscale=True
+        ),
+        text= text,
+    )]
+
+def binned_scatter(x, y, color, text, bins = GRID_BINS, colorscale = 'Plasma', color_name = 'Age'):
+    x = np.asarray(x, dtype = 'float64')
+    y = np.asarray(y, dtype = 'float64')
+    c = np.asarray(color, dtype = 'float64')
+    text = np.asarray(text, dtype = object)
+    keep = np.isfinite(x) & np.isfinite(y) & np.isfinite(c)
+    x, y, c, text = x[keep], y[keep], c[keep], text[keep]
+
+    # density grid: count and mean colour per cell
+    x_edges = np.linspace(x.min(), x.max(), bins + 1)
+    y_edges = np.linspace(y.min(), y.max(), bins + 1)
+    ix = np.clip(np.searchsorted(x_edges, x, side = 'right') - 1, 0, bins - 1)
+    iy = np.clip(np.searchsorted(y_edges, y, side = 'right') - 1, 0, bins - 1)
+    cell = ix * bins + iy
+    counts = np.bincount(cell, minlength = bins * bins)
+    mean_c = np.bincount(cell, weights = c, minlength = bins * bins)
+    filled = counts.nonzero()[0]
+    mean_c = mean_c[filled] / counts[filled]
+    x_mid = (x_edges[:-1] + x_edges[1:]) / 2
+    y_mid = (y_edges[:-1] + y_edges[1:]) / 2
+    cmin, cmax = c.min(), c.max()
+
+    grid = go.Scattergl(
+        x = x_mid[filled // bins],
+        y = y_mid[filled % bins],
+        mode = 'markers',
+        marker = dict(size = 4 + 12 * np.log1p(counts[filled]) / np.log1p(counts.max()), color = mean_c,
+                      colorscale = colorscale, cmin = cmin, cmax = cmax, showscale = True,
+                      colorbar = dict(title = 'mean ' + color_name)),
+        text = ['{} players, mean {} {:.1f}'.format(n, color_name, m) for n, m in zip(counts[filled], mean_c)],
+        name = 'density',
+    )
+
+    # outliers keep their own hover: points in sparse cells plus the highest y values
+    outliers = np.flatnonzero(counts[cell] <= SPARSE_BIN)
+    top = np.argpartition(-y, min(MAX_OUTLIERS, len(y)) - 1)[:MAX_OUTLIERS]
+    outliers = np.union1d(outliers, top)
+    if len(outliers) > MAX_OUTLIERS:
+        outliers = outliers[np.argsort(-y[outliers])[:MAX_OUTLIERS]]
+    points = go.Scattergl(
+        x = x[outliers],
+        y = y[outliers],
+        mode = 'markers',
+        marker = dict(size = 6, color = c[outliers], colorscale = colorscale, cmin = cmin, cmax = cmax),
+        text = text[outliers],
+        name = 'outliers',
+    )
+    return [grid, points]
@@ -0,0 +1,256 @@
+'''Indexes over the dashboard frame.
+
+RankingIndex keeps argsort permutations per ranked column (and per row
+group, e.g. a position), so a top-N leaderboard is a slice of length N
+instead of a sort of the whole frame. PositionIndex parses the
+comma-separated player_positions once into a bitmask per player.
+PromisingIndex answers the scouting query (growth, potential, age, clubs,
+positions) from sorted columns and those bitmasks.
+'''
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import fifa_data
+
+# columns whose descending order is precomputed by fifa_build
+RANKED_COLUMNS = ['Value(Euro)', 'Wage(Euro)', 'Overall', 'Potential', 'skill_fk_accuracy']
+# row groups kept by a RankingIndex (each is a mask over every row, plus its cached orders)
+GROUP_LIMIT = 64
+
+def column_values(frame, column):
+    # float view of a column with gaps as NaN (works for the nullable compact dtypes too)
+    return frame[column].to_numpy(dtype = 'float64', na_value = np.nan)
+
+def _sort_key(values, ascending):
+    # gaps always rank last
+    values = np.asarray(values, dtype = 'float64')
+    if ascending:
+        return np.where(np.isnan(values), np.inf, values)
+    return np.where(np.isnan(values), np.inf, -values)
+
+def rank_order(values, ascending = False):
+    return np.argsort(_sort_key(values, ascending), kind = 'stable')
+
+def top_k(values, n, ascending = False):
+    # argpartition path for ad-hoc values: O(len(values) + n log n)
+    key = _sort_key(values, ascending)
+    n = max(0, min(n, len(key)))
+    if n == 0:
+        return np.empty(0, dtype = np.intp)
+    part = np.argpartition(key, n - 1)[:n]
+    return part[np.argsort(key[part], kind = 'stable')]
+
+###########################################################################################################
+class RankingIndex:
+
+    def __init__(self, frame, orders = None, groups = None, group_limit = GROUP_LIMIT):
+        # orders: {column: descending permutation of all rows} (a dict or a DataFrame); groups: {name: boolean row mask}
+        self.frame = frame
+        # least recently used first; past group_limit the oldest group is dropped along with its orders
+        self.groups = OrderedDict(groups or {})
+        self.group_limit = group_limit
+        self._orders = {}
+        self._lock = threading.Lock()
+        if orders is not None:
+            for column in orders:
+                self._orders[(column, None, False)] = np.asarray(orders[column])
+
+    def add_group(self, name, build):
+        # build() makes the boolean row mask; it is only called when the group is not registered
+        with self._lock:
+            if name in self.groups:
+                self.groups.move_to_end(name)
+                return name
+        mask = np.asarray(build(), dtype = bool)
+        with self._lock:
+            self.groups.setdefault(name, mask)
+            self.groups.move_to_end(name)
+            while len(self.groups) > self.group_limit:
+                old, _ = self.groups.popitem(last = False)
+                for key in [k for k in self._orders if k[1] == old]:
+                    del self._orders[key]
+        return name
+
+    def group(self, name):
+        # KeyError once the group has been dropped
+        with self._lock:
+            mask = self.groups[name]
+            self.groups.move_to_end(name)
+        return mask
+
+    def order(self, column, group = None, ascending = False):
+        key = (column, group, ascending)
+        order = self._orders.get(key)
+        if order is None:
+            if group is None:
+                full = self._orders.get((column, None, not ascending))
+                # reversing a descending order is not enough when there are gaps, so only reuse it without them
+                if full is not None and not np.isnan(column_values(self.frame, column)).any():
+                    order = full[::-1]
+                else:
+                    order = rank_order(column_values(self.frame, column), ascending)
+            else:
+                # filtering the full order keeps it sorted: O(n) instead of a sort per group
+                full = self.order(column, None, ascending)
+                order = full[self.group(group)[full]]
+            with self._lock:
+                # not for a group dropped meanwhile, or its orders would outlive it
+                if group is None or group in self.groups:
+                    self._orders[key] = order
+        return order
+
+    def take(self, rows, columns = None):
+        # never iloc: the frame is the shared view and must stay unconsolidated
+        return fifa_data.take_rows(self.frame, rows, columns)
+
+    def top(self, column, n, group = None, ascending = False, columns = None):
+        return self.take(self.order(column, group, ascending)[:n], columns)
+
+    def top_values(self, values, n, group = None, ascending = False, columns = None):
+        # leaderboard for values that are not a column of the frame (e.g. Potential - Overall)
+        values = np.asarray(values, dtype = 'float64')
+        if group is None:
+            rows = top_k(values, n, ascending)
+        else:
+            members = np.flatnonzero(self.group(group))
+            rows = members[top_k(values[members], n, ascending)]
+        return self.take(rows, columns)
+
+###########################################################################################################
+# Every position code used by FIFA 20 (player_positions, team_position and nation_position)
+POSITIONS = ['GK', 'SW', 'RWB', 'RB', 'RCB', 'CB', 'LCB', 'LB', 'LWB', 'RDM', 'CDM', 'LDM', 'RM', 'RCM', 'CM',
+             'LCM', 'LM', 'RAM', 'CAM', 'LAM', 'RF', 'CF', 'LF', 'RW', 'RS', 'ST', 'LS', 'LW']
+POSITION_BITS = dict((p, np.uint32(1 << i)) for i, p in enumerate(POSITIONS))
+NO_POSITION = len(POSITIONS)
+
+def position_bits(positions):
+    bits = np.uint32(0)
+    for p in positions:
+        bits |= POSITION_BITS[p]
+    return bits
+
+class PositionIndex:
+
+    def __init__(self, player_positions):
+        # the position strings have low cardinality, so each distinct one is parsed once
+        codes, uniques = pd.factorize(pd.Series(player_positions).astype(object), sort = False)
+        masks = np.zeros(len(uniques) + 1, dtype = np.uint32)
+        primary = np.full(len(uniques) + 1, NO_POSITION, dtype = np.uint8)
+        for i, text in enumerate(uniques):
+            listed = [p.strip() for p in str(text).split(',') if p.strip() in POSITION_BITS]
+            masks[i] = position_bits(listed)
+            if listed:
+                primary[i] = POSITIONS.index(listed[0])
+        # missing values (code -1) map to the last, empty entry
+        self.masks = masks[codes]
+        self.primary = primary[codes]
+
+    def any_of(self, positions):
+        return (self.masks & position_bits(positions)) != 0
+
+    def all_of(self, positions):
+        bits = position_bits(positions)
+        return (self.masks & bits) == bits
+
+    def primary_in(self, positions):
+        # primary position = the first one listed
+        return ((np.uint32(1) << self.primary.astype(np.uint32)) & position_bits(positions)) != 0
+
+    def query(self, positions, mode = 'any'):
+        if not positions:
+            return np.ones(len(self.masks), dtype = bool)
+        if mode == 'all':
+            return self.all_of(positions)
+        if mode == 'primary':
+            return self.primary_in(positions)
+        return self.any_of(positions)
+
+    def listed(self):
+        # positions that at least one player has, in POSITIONS order
+        present = np.bitwise_or.reduce(self.masks) if len(self.masks) else 0
+        return [p for p in POSITIONS if present & POSITION_BITS[p]]
+
+###########################################################################################################
+# Promising players: threshold queries over sorted columns, cached per parameter tuple
+class PromisingIndex:
+
+    def __init__(self, frame, positions, club_column = 'Club', cache_size = 256):
+        overall = column_values(frame, 'Overall')
+        potential = column_values(frame, 'Potential')
+        columns = {'Age': column_values(frame, 'Age'), 'Potential': potential, 'growth': potential - overall}
+        # ascending order and sorted values per column; gaps sort last and never match a threshold
+        self._sorted = {}
+        for name, values in columns.items():
+            order = rank_order(values, ascending = True)
+            self._sorted[name] = (order, values[order], int(np.count_nonzero(~np.isnan(values))))
+        self._output_order = rank_order(potential)
+
+        codes, uniques = pd.factorize(frame[club_column].astype(object))
+        self._club_codes = codes
+        self.clubs = list(uniques)
+        self._club_code = dict((c, i) for i, c in enumerate(uniques))
+        self.positions = positions
+        self.size = len(frame)
+
+        self.cache_size = cache_size
+        # used from the session threads and from the figure pool (warm_plotly)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def at_least(self, name, threshold):
+        order, values, valid = self._sorted[name]
+        mask = np.zeros(self.size, dtype = bool)
+        mask[order[np.searchsorted(values[:valid], threshold, 'left'):valid]] = True
+        return mask
+
+    def at_most(self, name, threshold):
+        order, values, valid = self._sorted[name]
+        mask = np.zeros(self.size, dtype = bool)
+        mask[order[:np.searchsorted(values[:valid], threshold, 'right')]] = True
+        return mask
+
+    def in_clubs(self, clubs):
+        # one lookup per club code; players without a club (code -1) hit the last, False entry
+        lookup = np.zeros(len(self.clubs) + 1, dtype = bool)
+        for c in clubs:
+            if c in self._club_code:
+                lookup[self._club_code[c]] = True
+        return lookup[self._club_codes]
+
+    def query(self, min_growth = 15, min_potential = 80, max_age = 20, clubs = None, positions = (), position_mode = 'any'):
+        # rows of the matching players, best Potential first
+        key = (min_growth, min_potential, max_age, None if clubs is None else tuple(sorted(clubs)), tuple(sorted(positions)), position_mode)
+        with self._lock:
+            rows = self._cache.get(key)
+            if rows is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return rows
+            self.misses += 1
+
+        mask = self.at_least('growth', min_growth) & self.at_least('Potential', min_potential) & self.at_most('Age', max_age)
+        if clubs is not None:
+            mask &= self.in_clubs(clubs)
+        if positions:
+            mask &= self.positions.query(list(positions), position_mode)
+        rows = self._output_order[mask[self._output_order]]
+
+        with self._lock:
+            rows = self._cache.setdefault(key, rows)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last = False)
+        return rows
+
+    def club_counts(self, rows):
+        # number of matching players per club, most first
+        codes = self._club_codes[rows]
+        counts = np.bincount(codes[codes >= 0], minlength = len(self.clubs))
+        present = np.flatnonzero(counts)
+        present = present[np.argsort(-counts[present], kind = 'stable')]
+        return pd.Series(counts[present], index = pd.Index([self.clubs[i] for i in present], name = 'Club'), name = 'Players')
@@ -0,0 +1,106 @@
+'''Fuzzy name search over players and clubs.
+
+Names are normalized once (mojibake repaired, accents folded, case folded)
+and broken into trigrams; a query is scored against every entry at once by
+counting shared trigrams over the posting lists. Player entries are the rows
+of the shared table and resolve to their unique sofifa_id, not to the short
+name (which repeats).
+'''
+import re
+import unicodedata
+
+import numpy as np
+
+###########################################################################################################
+def repair(text):
+    # UTF-8 text that was decoded as latin-1 somewhere along the way, e.g. 'MÃ¼nchen' -> 'München'
+    try:
+        fixed = text.encode('latin-1').decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return text
+    return fixed
+
+# letters that NFKD does not split into a base letter and an accent
+FOLD = str.maketrans({'ø': 'o', 'æ': 'ae', 'œ': 'oe', 'đ': 'd', 'ð': 'd', 'ł': 'l', 'ı': 'i', 'þ': 'th'})
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', repair(str(text)))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold().translate(FOLD)
+    return re.sub(r'[^0-9a-z]+', ' ', text).strip()
+
+def trigrams(text, prefix = False):
+    # word-start padding; a query being typed is not padded at the end, so it matches as a prefix
+    padded = '  ' + text + ('' if prefix else ' ')
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+###########################################################################################################
+class SearchIndex:
+
+    def __init__(self, names, labels, weights = None, ids = None):
+        # names: per entry, the strings it can be found by; labels: what the UI shows; ids: unique keys (default: position)
+        self.labels = list(labels)
+        self.size = len(self.labels)
+        self.weights = np.zeros(self.size) if weights is None else np.nan_to_num(np.asarray(weights, dtype = 'float64'))
+        self.ids = np.arange(self.size) if ids is None else np.asarray(ids)
+        self._row_of = dict((i, r) for r, i in enumerate(self.ids.tolist()))
+        self._keys = [sorted(set(normalize(n) for n in entry if isinstance(n, str) and n)) for entry in names]
+
+        postings = {}
+        counts = np.zeros(self.size, dtype = np.int32)
+        for i, keys in enumerate(self._keys):
+            grams = set()
+            for key in keys:
+                grams |= trigrams(key)
+            counts[i] = len(grams)
+            for g in grams:
+                postings.setdefault(g, []).append(i)
+        self._postings = dict((g, np.array(rows, dtype = np.int32)) for g, rows in postings.items())
+        self._gram_counts = counts
+        self._exact = {}
+        for i, keys in enumerate(self._keys):
+            for key in keys:
+                self._exact.setdefault(key, i)
+
+    def rows(self, ids):
+        return np.array([self._row_of[i] for i in ids if i in self._row_of], dtype = np.intp)
+
+    def label(self, id):
+        return self.labels[self._row_of[id]]
+
+    def lookup(self, text):
+        # exact match after normalization (e.g. a club name with mojibake); None if unknown
+        return self._exact.get(normalize(text))
+
+    def search(self, query, limit = 10):
+        # entries ranked by shared trigrams (typo tolerant), prefix matches first, then by weight
+        query = normalize(query)
+        if not query:
+            return np.empty(0, dtype = np.intp)
+        grams = [g for g in trigrams(query, prefix = True) if g in self._postings]
+        if not grams:
+            return np.empty(0, dtype = np.intp)
+        shared = np.bincount(np.concatenate([self._postings[g] for g in grams]), minlength = self.size)
+        candidates = np.flatnonzero(shared)
+        # Dice-like similarity: shared trigrams against the size of both trigram sets
+        n_query = len(trigrams(query, prefix = True))
+        score = 2.0 * shared[candidates] / (n_query + np.minimum(self._gram_counts[candidates], 4 * n_query))
+        keep = max(limit * 5, 50)
+        if len(candidates) > keep:
+            best = np.argpartition(-score, keep - 1)[:keep]
+            candidates, score = candidates[best], score[best]
+
+        prefix = np.array([any((' ' + k).find(' ' + query) >= 0 for k in self._keys[i]) for i in candidates], dtype = bool)
+        order = np.lexsort((-self.weights[candidates], -np.round(score, 3), ~prefix))
+        return candidates[order[:limit]]
+
+###########################################################################################################
+def player_index(table):
+    # rows of the shared table, found by short or long name, shown with their club, stronger players first
+    clubs = table['club'].astype(object).where(table['club'].notna(), '-')
+    labels = ['{} ({}, {})'.format(s, c, i) for s, c, i in zip(table['short_name'], clubs, table['sofifa_id'])]
+    return SearchIndex(zip(table['short_name'], table['long_name']), labels, table['overall'].to_numpy(dtype = 'float64'),
+                       ids = table['sofifa_id'].to_numpy(dtype = 'int64'))
+
+def club_index(clubs):
+    clubs = list(clubs)
+    return SearchIndex([[c] for c in clubs], clubs)
@@ -0,0 +1,230 @@
+'''Per-section execution helpers for FIFA_App.py.
+
+Streamlit re-executes the whole script on every widget change, so anything
+defined in the script itself is rebuilt on each rerun. The memo store and the
+section timings live in this imported module instead.
+
+With profiling on (FIFA_PROFILE=1, or the app's debug switch) sections and
+traced functions also record spans, caches report their hits and misses and
+payloads their size; the spans export as a Chrome trace. With it off, each
+instrumented call costs one flag check.
+'''
+import functools
+import json
+import numbers
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+
+# FIFA_PROFILE=1 turns profiling on from the start; the app's debug buttons switch it later
+PROFILE = os.environ.get('FIFA_PROFILE', '') not in ('', '0')
+TRACE_EVENTS = 20000            # spans kept for the trace export (oldest dropped first)
+
+_MEMO = {}
+_MEMO_LOCK = threading.Lock()
+_BOUNDED = []                   # the stores of memoized(size = n) functions
+_MISSING = object()
+_RUN = threading.local()
+
+def memoized(func = None, size = None):
+    # keyed on the function's name, its bytecode (so edits invalidate) and its (hashable) arguments;
+    # size: keep only the last `size` results used (for free-form arguments such as a budget)
+    if func is None:
+        return functools.partial(memoized, size = size)
+    if size is None:
+        store = _MEMO
+    else:
+        store = OrderedDict()
+        _BOUNDED.append(store)
+
+    def wrapper(*args):
+        key = (func.__qualname__, func.__code__.co_code) + args
+        if size is None:
+            value = store.get(key, _MISSING)
+        else:
+            with _MEMO_LOCK:
+                value = store.get(key, _MISSING)
+                if value is not _MISSING:
+                    store.move_to_end(key)
+        if value is not _MISSING:
+            if PROFILE:
+                count('memo ' + func.__qualname__, True)
+            return value
+        if PROFILE:
+            count('memo ' + func.__qualname__, False)
+            with span(func.__qualname__, 'memoized'):
+                value = func(*args)
+        else:
+            value = func(*args)
+        with _MEMO_LOCK:
+            value = store.setdefault(key, value)
+            if size is not None:
+                store.move_to_end(key)
+                while len(store) > size:
+                    store.popitem(last = False)
+            return value
+    wrapper.__name__ = func.__name__
+    wrapper.__qualname__ = func.__qualname__
+    return wrapper
+
+def clear_memo():
+    with _MEMO_LOCK:
+        _MEMO.clear()
+        for store in _BOUNDED:
+            store.clear()
+
+###########################################################################################################
+# Timings of the sections executed in the current script run (one script run per thread)
+def start_run():
+    _RUN.timings = []
+    _RUN.started = time.perf_counter()
+
+def timings():
+    return getattr(_RUN, 'timings', [])
+
+@contextmanager
+def section(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ended = time.perf_counter()
+        timings().append((name, (ended - started) * 1000))
+        if PROFILE:
+            _record(name, 'section', started, ended)
+
+def show_timings(container):
+    total = (time.perf_counter() - getattr(_RUN, 'started', time.perf_counter())) * 1000
+    lines = ['{:<32} {:8.1f} ms'.format(name, ms) for name, ms in timings()]
+    lines.append('{:<32} {:8.1f} ms'.format('whole rerun', total))
+    container.text('\n'.join(lines))
+
+###########################################################################################################
+# Instrumentation: spans (all threads, bounded), cache hit counters and payload gauges
+_EVENTS = deque(maxlen = TRACE_EVENTS)
+_THREADS = {}
+_COUNTS = {}
+_COUNTERS = {}
+_GAUGES = {}
+_STATS_LOCK = threading.Lock()
+
+def enable(on = True):
+    global PROFILE
+    PROFILE = bool(on)
+
+def _record(name, category, started, ended, args = None):
+    thread = threading.current_thread()
+    _THREADS[thread.ident] = thread.name
+    _EVENTS.append((name, category, started, ended, thread.ident, args))
+
+class _Span:
+
+    def __init__(self, name, category):
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        _record(self.name, self.category, self.started, time.perf_counter())
+
+_NO_SPAN = nullcontext()
+
+def span(name, category = 'function'):
+    # a shared no-op context while profiling is off
+    return _Span(name, category) if PROFILE else _NO_SPAN
+
+def traced(func):
+    # a span per call while profiling; a plain call otherwise
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not PROFILE:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _record(func.__qualname__, 'function', started, time.perf_counter())
+    return wrapper
+
+def count(name, hit):
+    # hits and misses of a cache that does not count them itself
+    with _STATS_LOCK:
+        counts = _COUNTS.setdefault(name, [0, 0])
+        counts[0 if hit else 1] += 1
+
+def register_counter(name, read):
+    # a cache that keeps its own counts: read() -> (hits, misses), called when the panel or a trace asks
+    _COUNTERS[name] = read
+
+def gauge(name, value):
+    # e.g. the bytes of a payload sent to the browser; the latest value is shown, each one is traced
+    if PROFILE:
+        # plain Python numbers (not numpy's), so that the trace stays JSON-serializable
+        value = int(value) if isinstance(value, numbers.Integral) else float(value)
+        _GAUGES[name] = value
+        _EVENTS.append((name, 'gauge', time.perf_counter(), None, threading.get_ident(), value))
+
+def cache_counts():
+    with _STATS_LOCK:
+        counts = dict((name, tuple(c)) for name, c in _COUNTS.items())
+    for name, read in list(_COUNTERS.items()):
+        counts[name] = tuple(read())
+    return counts
+
+def span_totals():
+    # name -> (calls, total ms, max ms) over the spans kept
+    totals = {}
+    for name, category, started, ended, _, _ in list(_EVENTS):
+        if ended is None:
+            continue
+        ms = (ended - started) * 1000
+        calls, total, longest = totals.get((category, name), (0, 0.0, 0.0))
+        totals[(category, name)] = (calls + 1, total + ms, max(longest, ms))
+    return totals
+
+def clear_profile():
+    with _STATS_LOCK:
+        _EVENTS.clear()
+        _COUNTS.clear()
+        _GAUGES.clear()
+
+def chrome_trace():
+    # Trace Event Format: complete ('X') events for spans, counter ('C') events for gauges and cache counts
+    pid = os.getpid()
+    events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}} for tid, name in _THREADS.items()]
+    for name, category, started, ended, tid, args in list(_EVENTS):
+        ts = started * 1e6
+        if ended is None:
+            events.append({'name': name, 'cat': category, 'ph': 'C', 'ts': ts, 'pid': pid, 'tid': tid, 'args': {'value': args}})
+        else:
+            events.append({'name': name, 'cat': category, 'ph': 'X', 'ts': ts, 'dur': (ended - started) * 1e6, 'pid': pid, 'tid': tid})
+    now = time.perf_counter() * 1e6
+    for name, (hits, misses) in cache_counts().items():
+        events.append({'name': name, 'cat': 'cache', 'ph': 'C', 'ts': now, 'pid': pid, 'tid': 0, 'args': {'hits': hits, 'misses': misses}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+def write_trace(path):
+    with open(path, 'w') as f:
+        json.dump(chrome_trace(), f)
+    return path
+
+def show_profile(container):
+    lines = ['{:<40} {:>7} {:>7} {:>6}'.format('cache', 'hits', 'misses', 'hit %')]
+    for name, (hits, misses) in sorted(cache_counts().items()):
+        lines.append('{:<40} {:7d} {:7d} {:6.1f}'.format(name[:40], hits, misses, 100 * hits / max(hits + misses, 1)))
+    container.text('\n'.join(lines))
+
+    lines = ['{:<40} {:>10}'.format('payload', 'KB')]
+    for name, value in sorted(_GAUGES.items()):
+        lines.append('{:<40} {:10.1f}'.format(name[:40], value / 1024))
+    container.text('\n'.join(lines))
+
+    lines = ['{:<40} {:>5} {:>9} {:>9}'.format('span (slowest total)', 'calls', 'total ms', 'max ms')]
+    totals = sorted(span_totals().items(), key = lambda item: -item[1][1])
+    for (category, name), (calls, total, longest) in totals[:20]:
+        lines.append('{:<40} {:5d} {:9.1f} {:9.1f}'.format('{}: {}'.format(category, name)[:40], calls, total, longest))
+    container.text('\n'.join(lines))
@@ -0,0 +1,195 @@
+'''Best starting XI from the per-position rating columns (LS ... RB).
+
+Picking an XI for a formation is an assignment problem (players x slots,
+weighted by each player's rating at the slot), solved with scipy's
+linear_sum_assignment. A Value(Euro) or wage budget turns it into an
+assignment with a knapsack constraint: the budget is priced into the weights
+(Lagrangian relaxation, bisection on the price) and the best affordable XI
+found is then improved by single-player swaps. That budgeted XI is a
+heuristic: it always fits the budget, but is not guaranteed to be the
+strongest one that does. Without a budget the XI is optimal.
+'''
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import fifa_index
+
+FORMATIONS = {
+    '4-4-2': ['GK', 'LB', 'LCB', 'RCB', 'RB', 'LM', 'LCM', 'RCM', 'RM', 'LS', 'RS'],
+    '4-3-3': ['GK', 'LB', 'LCB', 'RCB', 'RB', 'LCM', 'CM', 'RCM', 'LW', 'ST', 'RW'],
+    '4-2-3-1': ['GK', 'LB', 'LCB', 'RCB', 'RB', 'LDM', 'RDM', 'LAM', 'CAM', 'RAM', 'ST'],
+    '3-5-2': ['GK', 'LCB', 'CB', 'RCB', 'LM', 'LDM', 'CAM', 'RDM', 'RM', 'LS', 'RS'],
+    '5-3-2': ['GK', 'LWB', 'LCB', 'CB', 'RCB', 'RWB', 'LCM', 'CM', 'RCM', 'LS', 'RS'],
+}
+BUDGET_COLUMNS = ['Value(Euro)', 'Wage(Euro)']
+
+# every slot with a rating: the position columns, plus GK (a goalkeeper's Overall)
+RATED_POSITIONS = [p for p in fifa_index.POSITIONS if p != 'SW']
+# weight of an empty slot, or of a player on a slot they cannot play: below any priced rating
+EMPTY = -1e9
+MAX_PRICE = 1e6
+PRUNE_ABOVE = 500               # bigger pools keep only each slot's best candidates
+BISECTION_STEPS = 30
+
+###########################################################################################################
+# Solver (module level so that it runs in the worker processes)
+def _assign(weights):
+    from scipy.optimize import linear_sum_assignment
+    # one "nobody" row per slot keeps the problem feasible when a slot has no eligible player
+    n, k = weights.shape
+    padded = np.vstack([weights, np.full((k, k), EMPTY)])
+    rows, slots = linear_sum_assignment(padded, maximize = True)
+    chosen = np.full(k, -1, dtype = np.intp)
+    real = rows < n
+    chosen[slots[real]] = rows[real]
+    # a player put on a slot they cannot play leaves it empty
+    filled = np.flatnonzero(chosen >= 0)
+    chosen[filled[weights[chosen[filled], filled] <= EMPTY / 2]] = -1
+    return chosen
+
+def _prune(ratings, keep):
+    # with k slots, each slot's best player is among its own top k: the union of those is exact
+    k = ratings.shape[1]
+    if len(ratings) <= max(PRUNE_ABOVE, k):
+        return np.arange(len(ratings))
+    top = np.argpartition(-keep, k - 1, axis = 0)[:k]
+    return np.unique(top)
+
+def _swap_repair(ratings, cost, chosen, budget):
+    # greedy single swaps: the best rating gain that still fits the budget, until none is left
+    k = ratings.shape[1]
+    while True:
+        filled = chosen >= 0
+        spent = cost[chosen[filled]].sum()
+        unused = np.ones(len(ratings), dtype = bool)
+        unused[chosen[filled]] = False
+        current = np.where(filled, ratings[np.maximum(chosen, 0), np.arange(k)], EMPTY)
+        current_cost = np.where(filled, cost[np.maximum(chosen, 0)], 0)
+        gain = ratings - current[None, :]
+        fits = (spent - current_cost[None, :] + cost[:, None]) <= budget
+        gain[~fits | ~unused[:, None] | (ratings <= EMPTY / 2)] = 0
+        best = np.unravel_index(np.argmax(gain), gain.shape)
+        if gain[best] <= 1e-9:
+            return chosen
+        chosen = chosen.copy()
+        chosen[best[1]] = best[0]
+
+def solve(ratings, cost = None, budget = None):
+    # ratings: players x slots, NaN where a player cannot play the slot; returns the player row per slot (-1: empty)
+    ratings = np.where(np.isnan(ratings), EMPTY, ratings).astype('float64')
+    n, k = ratings.shape
+    if budget is None:
+        pool = _prune(ratings, ratings)
+        chosen = _assign(ratings[pool])
+        return np.where(chosen >= 0, pool[np.maximum(chosen, 0)], -1)
+
+    cost = np.nan_to_num(np.asarray(cost, dtype = 'float64'))
+    scaled = cost / max(cost.max(), 1.0)
+    def priced(price):
+        weights = np.where(ratings > EMPTY / 2, ratings - price * scaled[:, None], EMPTY)
+        pool = _prune(ratings, weights)
+        chosen = _assign(weights[pool])
+        return np.where(chosen >= 0, pool[np.maximum(chosen, 0)], -1)
+    def spent(chosen):
+        return cost[chosen[chosen >= 0]].sum()
+
+    best = priced(0.0)
+    if spent(best) > budget:
+        # raise the price of money until the XI fits, then bisect for the lowest such price
+        lo, hi = 0.0, 100.0
+        best = priced(hi)
+        while spent(best) > budget and hi < MAX_PRICE:
+            lo, hi = hi, hi * 10
+            best = priced(hi)
+        if spent(best) > budget:
+            return None
+        for _ in range(BISECTION_STEPS):
+            mid = (lo + hi) / 2
+            chosen = priced(mid)
+            if spent(chosen) <= budget:
+                hi, best = mid, chosen
+            else:
+                lo = mid
+    return _swap_repair(ratings, cost, best, budget)
+
+def _solve_many(tasks):
+    return [solve(*task) for task in tasks]
+
+###########################################################################################################
+class SquadOptimizer:
+
+    def __init__(self, engine, clubs, positions):
+        # engine: fifa_compare.ComparisonEngine with the position columns; clubs and positions share its row order
+        n = len(engine.matrix)
+        self.ratings = np.full((n, len(RATED_POSITIONS)), np.nan, dtype = 'float32')
+        for j, p in enumerate(RATED_POSITIONS):
+            if p == 'GK':
+                self.ratings[:, j] = np.where(positions.any_of(['GK']), engine.column('Overall'), np.nan)
+            else:
+                self.ratings[:, j] = engine.column(p)
+        self._slot = dict((p, j) for j, p in enumerate(RATED_POSITIONS))
+        self.costs = dict((c, np.nan_to_num(engine.column(c).astype('float64'))) for c in BUDGET_COLUMNS)
+        self.names = engine.names
+
+        codes, uniques = pd.factorize(pd.Series(clubs).astype(object))
+        order = np.argsort(codes, kind = 'stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        self.clubs = list(uniques)
+        self._members = dict((club, order[bounds[i]:bounds[i + 1]]) for i, club in enumerate(uniques))
+
+    def _task(self, rows, formation, budget_column, budget):
+        ratings = self.ratings[np.ix_(rows, [self._slot[s] for s in FORMATIONS[formation]])]
+        if budget is None:
+            return (ratings,)
+        return (ratings, self.costs[budget_column][rows], budget)
+
+    def _result(self, rows, chosen, formation):
+        slots = FORMATIONS[formation]
+        if chosen is None:
+            return None
+        picked = np.where(chosen >= 0, rows[np.maximum(chosen, 0)], -1)
+        rating = [float(self.ratings[r, self._slot[s]]) if r >= 0 else np.nan for r, s in zip(picked, slots)]
+        return pd.DataFrame({
+            'Position': slots,
+            'Name': [self.names[r] if r >= 0 else '-' for r in picked],
+            'Rating': rating,
+            'Value(Euro)': [self.costs['Value(Euro)'][r] if r >= 0 else 0 for r in picked],
+            'Wage(Euro)': [self.costs['Wage(Euro)'][r] if r >= 0 else 0 for r in picked],
+        }, index = pd.Index(picked, name = 'row'))
+
+    def best_xi(self, formation, rows = None, budget_column = None, budget = None):
+        # rows: the player pool (a club's squad, a filtered selection...); None: every player
+        rows = np.arange(len(self.ratings)) if rows is None else np.asarray(rows)
+        chosen = solve(*self._task(rows, formation, budget_column, budget))
+        return self._result(rows, chosen, formation)
+
+    def club_xi(self, club, formation, budget_column = None, budget = None):
+        return self.best_xi(formation, self._members.get(club, np.empty(0, dtype = np.intp)), budget_column, budget)
+
+    def all_clubs(self, formation, budget_column = None, budget = None, workers = None):
+        # best XI of every club; the clubs are split into one batch per worker process
+        clubs = self.clubs
+        tasks = [self._task(self._members[c], formation, budget_column, budget) for c in clubs]
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            solved = _solve_many(tasks)
+        else:
+            size = -(-len(tasks) // workers)
+            with ProcessPoolExecutor(max_workers = workers) as pool:
+                solved = [c for batch in pool.map(_solve_many, [tasks[i:i + size] for i in range(0, len(tasks), size)]) for c in batch]
+
+        # one row of totals per club, straight from the arrays
+        slots = np.array([self._slot[s] for s in FORMATIONS[formation]])
+        records = np.full((len(clubs), 4), np.nan)
+        for i, (club, chosen) in enumerate(zip(clubs, solved)):
+            if chosen is None:
+                continue
+            filled = chosen >= 0
+            picked = self._members[club][chosen[filled]]
+            records[i] = (self.ratings[picked, slots[filled]].sum() / len(slots), filled.sum(),
+                          self.costs['Value(Euro)'][picked].sum(), self.costs['Wage(Euro)'][picked].sum())
+        table = pd.DataFrame(records, index = pd.Index(clubs, name = 'Club'), columns = ['XI Rating', 'Slots filled', 'XI Value(Euro)', 'XI Wage(Euro)'])
+        return table.sort_values('XI Rating', ascending = False)
@@ -0,0 +1,225 @@
+'''Out-of-core ingestion of season files.
+
+    python fifa_stream.py [players_15.csv players_16.csv ...] [--chunksize N] [--force]
+
+Each season file (players_15.csv ... players_20.csv, or a synthetic file of
+millions of rows) is read in chunks through a generator pipeline and folded
+into fixed-size accumulators: online covariance for the GK / defense /
+attack correlation matrices, per-club totals and top-K heaps. Peak memory
+depends on the chunk size (and the number of clubs), not on the number of
+rows. The summaries are written next to the table cache, keyed on the
+file's hash, so the app only reads them.
+'''
+import argparse
+import glob
+import heapq
+import json
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+import fifa_build
+import fifa_data
+import fifa_index
+
+CHUNK_ROWS = 50000
+TOP_K = 20
+SEASON_PATTERN = 'players_*.csv'
+SUMMARY_VERSION = 1
+
+CLUB_METRICS = ['value_eur', 'wage_eur', 'overall']
+TOP_COLUMNS = ['value_eur', 'wage_eur', 'overall', 'potential']
+TOP_KEEP = ['short_name', 'club', 'age']
+
+# only these columns are parsed: the text-heavy rest of the schema would dominate each chunk
+STREAM_COLS = sorted(set(fifa_build.GK_CORR_COLS + fifa_build.DEFENSE_CORR_COLS + fifa_build.ATTACK_CORR_COLS +
+                         CLUB_METRICS + TOP_COLUMNS + TOP_KEEP + ['player_positions']))
+
+def season_files(directory = '.', pattern = SEASON_PATTERN):
+    return sorted(glob.glob(os.path.join(directory, pattern)))
+
+def season_name(path):
+    match = re.search(r'players_(\d+)', os.path.basename(path))
+    return 'FIFA {}'.format(match.group(1)) if match else os.path.splitext(os.path.basename(path))[0]
+
+###########################################################################################################
+# Pipeline stages
+def read_chunks(path, chunksize = CHUNK_ROWS, columns = STREAM_COLS):
+    # typed chunks of the declared schema
+    columns = set(columns)
+    for chunk in pd.read_csv(path, usecols = lambda c: c in columns, dtype = fifa_data.SCHEMA, chunksize = chunksize):
+        yield chunk
+
+def with_positions(chunks):
+    # the position bitmasks are built per chunk, like every other derived column
+    for chunk in chunks:
+        yield chunk, fifa_index.PositionIndex(chunk['player_positions'])
+
+###########################################################################################################
+# Accumulators (memory independent of the number of rows)
+class OnlineCovariance:
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.n = 0
+        self.mean = np.zeros(len(self.columns))
+        self.comoment = np.zeros((len(self.columns), len(self.columns)))
+
+    def update(self, frame):
+        # rows with a gap are skipped, as dropna() does before the in-memory corr()
+        # DataFrame.to_numpy has no na_value before pandas 1.1: gaps become NaN through astype
+        X = frame[self.columns].astype('float64').to_numpy()
+        X = X[~np.isnan(X).any(axis = 1)]
+        m = len(X)
+        if m == 0:
+            return
+        mean = X.mean(axis = 0)
+        centered = X - mean
+        # Chan et al.: merge the chunk's co-moment into the running one
+        delta = mean - self.mean
+        n = self.n + m
+        self.comoment += centered.T @ centered + np.outer(delta, delta) * (self.n * m / n)
+        self.mean += delta * (m / n)
+        self.n = n
+
+    def correlation(self):
+        with np.errstate(all = 'ignore'):
+            cov = self.comoment / (self.n - 1)
+            d = np.sqrt(np.diag(cov))
+            corr = cov / np.outer(d, d)
+        return pd.DataFrame(corr, index = self.columns, columns = self.columns)
+
+class ClubTotals:
+
+    def __init__(self, metrics = CLUB_METRICS):
+        self.metrics = list(metrics)
+        self.totals = None
+
+    def update(self, chunk):
+        groups = chunk[['club'] + self.metrics].fillna({'club': '-'}).groupby('club')
+        part = groups[self.metrics].sum()
+        part['players'] = groups.size()
+        self.totals = part if self.totals is None else self.totals.add(part, fill_value = 0)
+
+    def frame(self):
+        totals = self.totals.copy()
+        totals['mean overall'] = totals['overall'] / totals['players']
+        return totals.drop(columns = 'overall').sort_values('value_eur', ascending = False)
+
+class TopK:
+
+    def __init__(self, column, k = TOP_K, keep = TOP_KEEP):
+        self.column = column
+        self.k = k
+        self.keep = list(keep)
+        self._heap = []
+        self._seen = 0
+
+    def update(self, chunk):
+        # only the chunk's own top k can enter the heap
+        for idx, value in chunk[self.column].nlargest(self.k).items():
+            # on ties the earlier row wins, as with a stable sort
+            item = (value, -self._seen, tuple(chunk.loc[idx, self.keep]))
+            self._seen += 1
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, item)
+            elif item > self._heap[0]:
+                heapq.heapreplace(self._heap, item)
+
+    def frame(self):
+        items = sorted(self._heap, reverse = True)
+        frame = pd.DataFrame([record for _, _, record in items], columns = self.keep)
+        frame[self.column] = [value for value, _, _ in items]
+        return frame
+
+###########################################################################################################
+def summarize(path, chunksize = CHUNK_ROWS, k = TOP_K):
+    gk = OnlineCovariance(fifa_build.GK_CORR_COLS)
+    defense = OnlineCovariance(fifa_build.DEFENSE_CORR_COLS)
+    attack = OnlineCovariance(fifa_build.ATTACK_CORR_COLS)
+    clubs = ClubTotals()
+    tops = dict((c, TopK(c, k)) for c in TOP_COLUMNS)
+    players = 0
+
+    for chunk, positions in with_positions(read_chunks(path, chunksize)):
+        players += len(chunk)
+        gk.update(chunk)
+        defense.update(chunk[positions.primary_in(fifa_build.DEFENSE_POS)])
+        attack.update(chunk[positions.primary_in(fifa_build.ATTACK_POS)])
+        clubs.update(chunk)
+        for top in tops.values():
+            top.update(chunk)
+
+    summary = {
+        'gk_corr': gk.correlation(),
+        'defense_corr': defense.correlation(),
+        'attack_corr': attack.correlation(),
+        'clubs': clubs.frame(),
+        'overview': pd.DataFrame({'players': [players]}, index = pd.Index([season_name(path)], name = 'season')),
+    }
+    for column, top in tops.items():
+        summary['top_' + column] = top.frame()
+    return summary
+
+###########################################################################################################
+# Summaries on disk: .fifa_cache/season_v<version>_<csv fingerprint>/<name>.feather + manifest.json
+def summary_dir(fingerprint):
+    return os.path.join(fifa_data.CACHE_DIR, 'season_v{}_{}'.format(SUMMARY_VERSION, fingerprint[:16]))
+
+def write_summary(path, chunksize = CHUNK_ROWS):
+    target = summary_dir(fifa_data.csv_fingerprint(path))
+    tmp = '{}.{}.tmp'.format(target, os.getpid())
+    shutil.rmtree(tmp, ignore_errors = True)
+    os.makedirs(tmp)
+    index_names = {}
+    for name, frame in summarize(path, chunksize).items():
+        index_names[name] = fifa_build.write_frame(frame, os.path.join(tmp, name + '.feather'))
+    with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+        json.dump({'version': SUMMARY_VERSION, 'csv': list(fifa_data.table_version(path)), 'index_names': index_names}, f, indent = 2)
+    shutil.rmtree(target, ignore_errors = True)
+    os.replace(tmp, target)
+    return target
+
+def read_summary(target):
+    with open(os.path.join(target, 'manifest.json')) as f:
+        manifest = json.load(f)
+    return dict((name, fifa_build.read_frame(os.path.join(target, name + '.feather'), index_name))
+                for name, index_name in manifest['index_names'].items())
+
+_SUMMARIES = {}
+_SUMMARIES_LOCK = threading.Lock()
+
+def load_summary(path, chunksize = CHUNK_ROWS):
+    version = fifa_data.table_version(path)
+    if version in _SUMMARIES:
+        return _SUMMARIES[version]
+    with _SUMMARIES_LOCK:
+        if version not in _SUMMARIES:
+            target = summary_dir(fifa_data.data_fingerprint(path))
+            if not os.path.exists(os.path.join(target, 'manifest.json')):
+                target = write_summary(path, chunksize)
+            _SUMMARIES[version] = read_summary(target)
+    return _SUMMARIES[version]
+
+###########################################################################################################
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Stream FIFA season files into per-season summaries.')
+    parser.add_argument('csv', nargs = '*', help = 'season files (default: {} in the current directory)'.format(SEASON_PATTERN))
+    parser.add_argument('--chunksize', type = int, default = CHUNK_ROWS, help = 'rows per chunk')
+    parser.add_argument('--force', action = 'store_true', help = 'rebuild summaries that already exist')
+    args = parser.parse_args(argv)
+
+    for path in args.csv or season_files():
+        target = summary_dir(fifa_data.csv_fingerprint(path))
+        if args.force or not os.path.exists(os.path.join(target, 'manifest.json')):
+            target = write_summary(path, args.chunksize)
+            print('built', path, '->', target)
+        else:
+            print('up to date', path, '->', target)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+'''Server-side paging for the dashboard tables.
+
+A PagedTable is a frame plus a RankingIndex over it. Sorting and filtering
+are resolved on the server through the index (a precomputed permutation,
+optionally restricted to a row group), and only one fixed-size page, with
+its integer columns downcast, is sent to the browser per interaction. The
+page after the one requested is prepared in the background.
+'''
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import fifa_index
+
+PAGE_ROWS = 25
+CACHED_PAGES = 64
+
+_PREFETCH = ThreadPoolExecutor(max_workers = 2)
+
+def display_frame(frame):
+    # what streamlit 0.63 can marshal: categoricals as their values, nullable integers as floats (<NA> as NaN)
+    convert = {}
+    for c in frame.columns:
+        if pd.api.types.is_categorical_dtype(frame[c].dtype):
+            convert[c] = object
+        elif pd.api.types.is_extension_array_dtype(frame[c].dtype) and pd.api.types.is_integer_dtype(frame[c].dtype):
+            convert[c] = 'float64'
+    if convert:
+        frame = frame.astype(convert)
+    if isinstance(frame.index, pd.CategoricalIndex):
+        frame = frame.copy(deep = False)
+        frame.index = frame.index.astype(object)
+    return frame
+
+def compact_page(page):
+    # smallest integer type per column (the page is encoded column by column); floats and text as they are
+    page = display_frame(page).copy()
+    for c in page.columns:
+        if pd.api.types.is_integer_dtype(page[c]):
+            page[c] = pd.to_numeric(page[c], downcast = 'integer')
+    return page
+
+###########################################################################################################
+class PagedTable:
+
+    def __init__(self, frame, ranks = None, columns = None, page_rows = PAGE_ROWS):
+        # ranks: a RankingIndex over frame (e.g. the app's, with its precomputed orders and position groups)
+        self.frame = frame
+        self.ranks = ranks if ranks is not None else fifa_index.RankingIndex(frame)
+        self.columns = list(columns) if columns is not None else list(frame.columns)
+        self.sortable = [c for c in self.columns if pd.api.types.is_numeric_dtype(frame[c])]
+        self.page_rows = page_rows
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def rows(self, sort = None, ascending = False, group = None):
+        # row positions in display order; sort = None keeps the frame's own order
+        if sort is not None:
+            return self.ranks.order(sort, group, ascending)
+        if group is None:
+            return np.arange(len(self.frame))
+        return np.flatnonzero(self.ranks.group(group))
+
+    def page_count(self, sort = None, ascending = False, group = None):
+        return max(1, -(-len(self.rows(sort, ascending, group)) // self.page_rows))
+
+    def _build(self, key):
+        sort, ascending, group, number = key
+        start = number * self.page_rows
+        rows = self.rows(sort, ascending, group)[start:start + self.page_rows]
+        return compact_page(self.ranks.take(rows, self.columns))
+
+    def page(self, number, sort = None, ascending = False, group = None):
+        key = (sort, ascending, group, number)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if page is None:
+            page = self._remember(key, self._build(key))
+        if number + 1 < self.page_count(sort, ascending, group):
+            _PREFETCH.submit(self.prefetch, (sort, ascending, group, number + 1))
+        return page
+
+    def prefetch(self, key):
+        with self._lock:
+            if key in self._pages:
+                return
+        try:
+            page = self._build(key)
+        except KeyError:
+            # the row group was dropped from the index meanwhile
+            return
+        self._remember(key, page)
+
+    def _remember(self, key, page):
+        with self._lock:
+            page = self._pages.setdefault(key, page)
+            self._pages.move_to_end(key)
+            while len(self._pages) > CACHED_PAGES:
+                self._pages.popitem(last = False)
+        return page